@@ -38,8 +38,8 @@ async def run_analysis():
         config = load_config("test_config.json")
 
         # Inicializar componentes
-        scanner = TestScanner(config.test)
-        analyzer = LLMAnalyzer(config.llm)
+        scanner = TestScanner(config.test, Path(config.cache_dir))
+        analyzer = LLMAnalyzer(config.llm, Path(config.cache_dir))
 
         # Escanear tests
         test_path = Path("test_samples")
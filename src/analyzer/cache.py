@@ -0,0 +1,134 @@
+"""
+Persistent LLM response cache.
+
+Stores raw model responses in files named after a hash of the request, so
+re-analyzing an unchanged suite does not call the model again. Entries
+expire after a maximum age and the oldest are evicted once the cache grows
+beyond its size limit.
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def request_key(model_id: str, temperature: float, prompt: str) -> str:
+    """Hash the parts of a request that determine its response.
+
+    Args:
+        model_id: Model the request is sent to.
+        temperature: Sampling temperature.
+        prompt: Prompt text.
+
+    Returns:
+        Hex digest identifying the request.
+    """
+    payload = json.dumps([model_id, temperature, prompt]).encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=20).hexdigest()
+
+
+class ResponseCache:
+    """Content-addressed store of model responses."""
+
+    def __init__(
+        self, cache_dir: Path, max_size_mb: float = 100, max_age_days: float = 30
+    ) -> None:
+        """Initialize cache, evicting entries that exceed the limits.
+
+        Args:
+            cache_dir: Directory the responses are stored under.
+            max_size_mb: Maximum total size of stored responses.
+            max_age_days: Age after which a response is discarded.
+        """
+        self.path = Path(cache_dir) / "llm_responses"
+        self.max_size = max_size_mb * 1024 * 1024
+        self.max_age = max_age_days * 24 * 3600
+        self.size = 0
+        self.evict()
+
+    def _entry_path(self, key: str) -> Path:
+        """Get the file a response is stored in.
+
+        Args:
+            key: Request key.
+
+        Returns:
+            Path of the entry.
+        """
+        return self.path / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a stored response.
+
+        Args:
+            key: Request key.
+
+        Returns:
+            Response text, or None if missing or expired.
+        """
+        entry_path = self._entry_path(key)
+        try:
+            if time.time() - entry_path.stat().st_mtime > self.max_age:
+                return None
+            with open(entry_path, "r", encoding="utf-8") as f:
+                response: str = json.load(f)["response"]
+                return response
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to read cached response {entry_path}: {e}")
+            return None
+
+    def put(self, key: str, response: str) -> None:
+        """Store a response.
+
+        Args:
+            key: Request key.
+            response: Response text.
+        """
+        entry_path = self._entry_path(key)
+        try:
+            entry_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = entry_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"key": key, "response": response}, f)
+            self.size += tmp_path.stat().st_size
+            os.replace(tmp_path, entry_path)
+        except Exception as e:
+            logger.warning(f"Failed to cache response {entry_path}: {e}")
+            return
+
+        if self.size > self.max_size:
+            self.evict()
+
+    def evict(self) -> None:
+        """Drop expired responses, then the oldest until under the size limit."""
+        if not self.path.exists():
+            return
+
+        now = time.time()
+        entries = []
+        for entry_path in self.path.glob("*/*.json"):
+            try:
+                stat = entry_path.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.max_age:
+                entry_path.unlink(missing_ok=True)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, entry_path))
+
+        self.size = sum(size for _, size, _ in entries)
+        entries.sort()
+        for _, size, entry_path in entries:
+            if self.size <= self.max_size:
+                break
+            entry_path.unlink(missing_ok=True)
+            self.size -= size
@@ -0,0 +1,82 @@
+"""
+Failure clustering.
+
+Reduces failures to signatures that ignore memory addresses, line numbers,
+numeric values and parametrization, so failures with the same root cause,
+such as a broken shared fixture, are analyzed once.
+"""
+
+import hashlib
+import re
+from typing import Dict, List, Optional
+
+from ..executor.executor import TestResult
+from ..scanner.scanner import TestInfo
+
+# Parts of a traceback that vary between otherwise identical failures
+ADDRESS = re.compile(r"\b0x[0-9a-fA-F]+\b")
+LINE_NUMBER = re.compile(r"(?<=:)\d+\b|(?<=line )\d+\b")
+PARAMETERS = re.compile(r"\[[^\]\n]*\]")
+NUMBER = re.compile(r"\b\d+(?:\.\d+)?(?:e[+-]?\d+)?\b")
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_traceback(text: str, test_name: Optional[str] = None) -> str:
+    """Strip the volatile parts of a traceback.
+
+    Args:
+        text: Traceback or error message.
+        test_name: Name of the failing test, replaced by a placeholder.
+
+    Returns:
+        Normalized text.
+    """
+    if test_name:
+        text = text.replace(test_name, "<test>")
+    text = ADDRESS.sub("<addr>", text)
+    text = LINE_NUMBER.sub("<line>", text)
+    text = PARAMETERS.sub("[<params>]", text)
+    text = NUMBER.sub("<n>", text)
+    return WHITESPACE.sub(" ", text).strip()
+
+
+def failure_signature(test: TestInfo, result: TestResult) -> Optional[str]:
+    """Compute the signature of a failed test.
+
+    Args:
+        test: Failed test.
+        result: Test execution result.
+
+    Returns:
+        Signature shared by failures with the same cause, or None if the
+        test did not fail.
+    """
+    if result.status not in ("failed", "error"):
+        return None
+
+    text = result.error_traceback or result.error_message or result.stderr or ""
+    normalized = normalize_traceback(text, test.function_name)
+    digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=12).hexdigest()
+    return f"{result.status}:{result.error_type or 'unknown'}:{digest}"
+
+
+def cluster_failures(
+    tests: List[TestInfo], results: Dict[str, TestResult]
+) -> Dict[str, List[TestInfo]]:
+    """Group failed tests by signature.
+
+    Args:
+        tests: Tests to group, in the order representatives are chosen.
+        results: Test execution results.
+
+    Returns:
+        Dictionary mapping signatures to failed tests, the first of which
+        represents the cluster.
+    """
+    clusters: Dict[str, List[TestInfo]] = {}
+    for test in tests:
+        result = results.get(test.id)
+        signature = failure_signature(test, result) if result else None
+        if signature is not None:
+            clusters.setdefault(signature, []).append(test)
+    return clusters
@@ -0,0 +1,403 @@
+"""
+Code context extraction for analysis prompts.
+
+Builds the code context of a prompt from the parts of the source that matter
+for a test: the test function, the setup of its class, the fixtures it
+requests and the project functions and classes these use, whether defined
+in the same file or imported. Parts are added in that order until the token
+budget is used up.
+"""
+
+import ast
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from ..core.logger import get_logger
+from ..scanner.scanner import TestInfo
+
+logger = get_logger(__name__)
+
+# Rough size of a token, for budgeting prompts without a tokenizer
+CHARS_PER_TOKEN = 4
+
+# Smallest remainder of the budget worth filling with a truncated part
+MIN_PART_CHARS = 200
+
+# Class methods that prepare or clean up the tests of a class
+SETUP_METHODS = {
+    "setUp",
+    "setUpClass",
+    "tearDown",
+    "tearDownClass",
+    "setup_method",
+    "setup_class",
+    "teardown_method",
+    "teardown_class",
+}
+
+# A parsed source file: its lines and syntax tree
+ParsedFile = Tuple[List[str], ast.Module]
+
+# Function and class definition nodes
+FunctionNode = Union[ast.FunctionDef, ast.AsyncFunctionDef]
+DefinitionNode = Union[ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef]
+
+# A definition within a parsed file, and a function definition in particular
+Definition = Tuple[Path, ParsedFile, DefinitionNode]
+FunctionDefinition = Tuple[Path, ParsedFile, FunctionNode]
+
+
+def _is_fixture(node: FunctionNode) -> bool:
+    """Check whether a function is decorated as a pytest fixture.
+
+    Args:
+        node: Function definition node.
+
+    Returns:
+        Whether the function is a fixture.
+    """
+    for dec in node.decorator_list:
+        target = dec.func if isinstance(dec, ast.Call) else dec
+        if isinstance(target, ast.Name) and target.id == "fixture":
+            return True
+        if isinstance(target, ast.Attribute) and target.attr == "fixture":
+            return True
+    return False
+
+
+def _functions(tree: Union[ast.Module, ast.ClassDef]) -> Iterator[FunctionNode]:
+    """Iterate over module-level and class-level function definitions.
+
+    Args:
+        tree: Module or class node.
+
+    Yields:
+        Function definition nodes.
+    """
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            yield node
+        elif isinstance(node, ast.ClassDef):
+            yield from _functions(node)
+
+
+class ContextBuilder:
+    """Extracts the code relevant to tests within a token budget."""
+
+    def __init__(self) -> None:
+        """Initialize builder with an empty parse cache."""
+        self.files: Dict[Path, Optional[ParsedFile]] = {}
+
+    def _parse(self, file_path: Path) -> Optional[ParsedFile]:
+        """Read and parse a source file, once.
+
+        Args:
+            file_path: Path of the file.
+
+        Returns:
+            Parsed file, or None if it cannot be read or parsed.
+        """
+        file_path = file_path.resolve()
+        if file_path not in self.files:
+            try:
+                source = file_path.read_text(encoding="utf-8")
+                self.files[file_path] = (
+                    source.splitlines(),
+                    ast.parse(source, filename=str(file_path)),
+                )
+            except Exception as e:
+                logger.warning(f"Failed to parse {file_path} for context: {e}")
+                self.files[file_path] = None
+        return self.files[file_path]
+
+    def _source(self, definition: Definition) -> str:
+        """Get the source of a definition, including its decorators.
+
+        Args:
+            definition: Definition to extract.
+
+        Returns:
+            Source preceded by a comment naming its location.
+        """
+        file_path, (lines, _), node = definition
+        start = min([node.lineno] + [dec.lineno for dec in node.decorator_list])
+        end = node.end_lineno or node.lineno
+        return f"# {file_path}:{start}\n" + "\n".join(lines[start - 1 : end])
+
+    def _find_test(self, test: TestInfo, tree: ast.Module) -> Optional[FunctionNode]:
+        """Find the definition of a test function.
+
+        Args:
+            test: Test to find.
+            tree: Syntax tree of the test file.
+
+        Returns:
+            Function definition node, if found.
+        """
+        candidates = [
+            node for node in _functions(tree) if node.name == test.function_name
+        ]
+        for node in candidates:
+            if node.lineno == test.line_number:
+                return node
+        return candidates[0] if candidates else None
+
+    def test_lines(self, test: TestInfo) -> Tuple[int, int]:
+        """Get the line range of a test function, including its decorators.
+
+        Args:
+            test: Test to locate.
+
+        Returns:
+            First and last line, just the definition line if the test cannot
+            be found.
+        """
+        parsed = self._parse(test.file_path)
+        node = self._find_test(test, parsed[1]) if parsed is not None else None
+        if node is None:
+            return test.line_number, test.line_number
+        start = min([node.lineno] + [dec.lineno for dec in node.decorator_list])
+        return start, node.end_lineno or node.lineno
+
+    def _find_class(self, test: TestInfo, tree: ast.Module) -> Optional[ast.ClassDef]:
+        """Find the definition of a test's class.
+
+        Args:
+            test: Test inside a class.
+            tree: Syntax tree of the test file.
+
+        Returns:
+            Class definition node, if found.
+        """
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ClassDef) and node.name == test.class_name:
+                return node
+        return None
+
+    def _conftests(self, file_path: Path) -> Iterator[Path]:
+        """Iterate over the conftest files applying to a test file.
+
+        Args:
+            file_path: Test file.
+
+        Yields:
+            Paths of existing conftest files, nearest first.
+        """
+        directory = file_path.resolve().parent
+        for parent in [directory, *directory.parents]:
+            conftest = parent / "conftest.py"
+            if conftest.is_file():
+                yield conftest
+            if (parent / ".git").exists():
+                break
+
+    def _find_fixture(self, name: str, test_file: Path) -> Optional[FunctionDefinition]:
+        """Find the definition of a fixture visible to a test file.
+
+        Args:
+            name: Fixture name.
+            test_file: Test file requesting the fixture.
+
+        Returns:
+            Fixture definition, or None for built-in or plugin fixtures.
+        """
+        for file_path in [test_file, *self._conftests(test_file)]:
+            parsed = self._parse(file_path)
+            if parsed is None:
+                continue
+            for node in _functions(parsed[1]):
+                if node.name == name and _is_fixture(node):
+                    return file_path, parsed, node
+        return None
+
+    def _resolve_module(
+        self, module: str, level: int, test_file: Path
+    ) -> Optional[Path]:
+        """Find the file of an imported module.
+
+        Absolute imports are looked up from the working directory and the
+        directories above the test file.
+
+        Args:
+            module: Module name, relative to the package for relative imports.
+            level: Number of leading dots of a relative import.
+            test_file: Importing test file.
+
+        Returns:
+            Path of the module file, if it is part of the project.
+        """
+        directory = test_file.resolve().parent
+        if level:
+            if level - 2 >= len(directory.parents):
+                return None
+            bases = [directory.parents[level - 2] if level > 1 else directory]
+        else:
+            bases = [Path.cwd(), directory, *directory.parents]
+
+        parts = module.split(".") if module else []
+        for base in bases:
+            target = base.joinpath(*parts)
+            for candidate in (target.with_suffix(".py"), target / "__init__.py"):
+                if parts and candidate.is_file():
+                    return candidate
+        return None
+
+    def _used_definitions(self, users: List[Definition]) -> List[Definition]:
+        """Find project definitions used by the given definitions.
+
+        Names are resolved against the module-level definitions and the
+        imports of the file each user is defined in.
+
+        Args:
+            users: Test, setup and fixture definitions.
+
+        Returns:
+            Function and class definitions they use, defined in the same file
+            or imported from project modules.
+        """
+        by_file: Dict[Path, Tuple[ParsedFile, List[DefinitionNode]]] = {}
+        for file_path, parsed, user in users:
+            by_file.setdefault(file_path, (parsed, []))[1].append(user)
+
+        definitions: List[Definition] = []
+        for file_path, (parsed, nodes) in by_file.items():
+            used_names: Set[str] = set()
+            used_attributes: Set[Tuple[str, str]] = set()
+            for node in (child for user in nodes for child in ast.walk(user)):
+                if isinstance(node, ast.Name):
+                    used_names.add(node.id)
+                elif isinstance(node, ast.Attribute) and isinstance(
+                    node.value, ast.Name
+                ):
+                    used_attributes.add((node.value.id, node.attr))
+
+            # Definitions of the same file used by name
+            tree = parsed[1]
+            definitions.extend(
+                (file_path, parsed, node)
+                for node in tree.body
+                if isinstance(
+                    node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+                )
+                and node.name in used_names
+                and node not in nodes
+            )
+
+            # Imported names used, as (module, level, name)
+            targets: List[Tuple[str, int, str]] = []
+            for node in tree.body:
+                if isinstance(node, ast.ImportFrom):
+                    for alias in node.names:
+                        if (alias.asname or alias.name) in used_names:
+                            targets.append((node.module or "", node.level, alias.name))
+                elif isinstance(node, ast.Import):
+                    for alias in node.names:
+                        bound = alias.asname or alias.name
+                        targets.extend(
+                            (alias.name, 0, attr)
+                            for value, attr in sorted(used_attributes)
+                            if value == bound
+                        )
+
+            for module, level, name in targets:
+                module_file = self._resolve_module(module, level, file_path)
+                if module_file is None:
+                    continue
+                module_parsed = self._parse(module_file)
+                if module_parsed is None:
+                    continue
+                definitions.extend(
+                    (module_file, module_parsed, node)
+                    for node in module_parsed[1].body
+                    if isinstance(
+                        node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+                    )
+                    and node.name == name
+                )
+        return definitions
+
+    def _parts(self, test: TestInfo) -> List[str]:
+        """Collect the source parts relevant to a test, most important first.
+
+        Args:
+            test: Test to collect context for.
+
+        Returns:
+            Source parts.
+        """
+        parsed = self._parse(test.file_path)
+        if parsed is None:
+            return []
+        test_node = self._find_test(test, parsed[1])
+        if test_node is None:
+            return []
+
+        # Definitions whose uses of project code are followed
+        users: List[Definition] = [(test.file_path, parsed, test_node)]
+        parts = [self._source(users[0])]
+
+        # Header and setup methods of the test's class
+        class_node = self._find_class(test, parsed[1]) if test.class_name else None
+        if class_node is not None:
+            lines = parsed[0]
+            parts.append(
+                f"# {test.file_path}:{class_node.lineno}\n"
+                f"{lines[class_node.lineno - 1]}"
+            )
+            for child in class_node.body:
+                if (
+                    isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))
+                    and child.name in SETUP_METHODS
+                ):
+                    users.append((test.file_path, parsed, child))
+                    parts.append(self._source(users[-1]))
+
+        # Requested fixtures and the fixtures they request in turn
+        seen = set(test.fixtures)
+        queue = deque(test.fixtures)
+        while queue:
+            fixture = self._find_fixture(queue.popleft(), test.file_path)
+            if fixture is None:
+                continue
+            parts.append(self._source(fixture))
+            users.append(fixture)
+            for arg in fixture[2].args.args:
+                if arg.arg not in seen and arg.arg not in ("self", "cls"):
+                    seen.add(arg.arg)
+                    queue.append(arg.arg)
+
+        parts.extend(
+            self._source(definition) for definition in self._used_definitions(users)
+        )
+        return parts
+
+    def build(self, tests: List[TestInfo], budget: int) -> str:
+        """Build the code context of one or more tests.
+
+        Parts shared by several tests are included once. The part that
+        exceeds the budget is truncated and later parts are dropped.
+
+        Args:
+            tests: Tests to build context for.
+            budget: Maximum size of the context in tokens.
+
+        Returns:
+            Code context.
+        """
+        remaining = max(budget, 0) * CHARS_PER_TOKEN
+        included: List[str] = []
+        for part in dict.fromkeys(part for test in tests for part in self._parts(test)):
+            if len(part) + 2 <= remaining:
+                included.append(part)
+                remaining -= len(part) + 2
+                continue
+            if remaining >= MIN_PART_CHARS or not included:
+                marker = "\n# ... truncated"
+                cut = part[: max(remaining - len(marker), 0)].rsplit("\n", 1)[0]
+                included.append(cut + marker)
+            break
+
+        if not included:
+            return "# Failed to extract test source"
+        return "\n\n".join(included)
@@ -4,23 +4,144 @@ LLM-powered test analyzer implementation using AWS Bedrock.
 Provides intelligent analysis of test results and code using Claude through AWS Bedrock.
 """
 
+import asyncio
 import json
+import math
 import os
+import random
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
 
 import boto3
 from botocore.config import Config
-from pydantic import BaseModel
+from botocore.exceptions import ClientError
+from botocore.exceptions import ConnectionError as BotoConnectionError
+from botocore.exceptions import HTTPClientError
+from pydantic import BaseModel, TypeAdapter, ValidationError
 
-from ..core.config import LLMConfig
-from ..core.exceptions import LLMError
+from ..core.config import LLMConfig, TriageConfig
+from ..core.exceptions import BudgetExceededError, LLMError
 from ..core.logger import get_logger
 from ..executor.executor import TestResult
 from ..scanner.scanner import TestInfo
+from .cache import ResponseCache, request_key
+from .clustering import cluster_failures, failure_signature
+from .context import CHARS_PER_TOKEN, ContextBuilder
+from .ratelimit import TokenBucket
+from .streaming import IssueStreamParser, StubBedrockClient
+from .triage import AnalysisBudget, TriagePolicy, has_deprecations, has_warnings
 
 logger = get_logger(__name__)
 
+T = TypeVar("T")
+
+# Share of the prompt budget a batch gives to test results over code context
+BATCH_RESULTS_SHARE = 0.5
+
+# Error codes worth retrying after a backoff; throttling also slows the limiter
+THROTTLING_CODES = {"ThrottlingException", "TooManyRequestsException"}
+RETRYABLE_CODES = THROTTLING_CODES | {
+    "InternalServerException",
+    "ModelNotReadyException",
+    "ModelTimeoutException",
+    "ServiceUnavailableException",
+}
+
+# Connection failures and timeouts before a response, always worth retrying
+TRANSIENT_ERRORS = (BotoConnectionError, HTTPClientError)
+
+# Exponential backoff bounds for retried requests, in seconds
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+# Marks the end of a prompt prefix Bedrock may cache between requests
+CACHE_CONTROL = {"type": "ephemeral"}
+
+# Steps of the scale durations are rounded up to in prompts
+DURATION_STEPS = (1, 2, 5, 10)
+
+# Static instructions for single test analysis, sent as a cached system block
+ANALYSIS_INSTRUCTIONS = """
+You analyze Python tests and their execution results.
+
+Please provide:
+1. List of potential issues in the test
+2. Suggestions for improvement
+3. Specific code fixes if applicable
+4. Coverage gaps and areas needing more testing
+
+Focus on:
+- Test reliability and robustness
+- Code quality and best practices
+- Coverage optimization
+- Performance improvements
+
+Format your response in sections:
+
+Issues:
+- Issue 1
+- Issue 2
+
+Suggestions:
+- Suggestion 1
+- Suggestion 2
+
+Code Fixes:
+```python
+# Original code
+[original code block]
+```
+```python
+# Suggested fix
+[fixed code block]
+```
+
+Coverage Gaps:
+- Gap 1
+- Gap 2
+"""
+
+# Follow-up asking the model to fix a response that could not be parsed
+REPAIR_PROMPT = """
+Your previous response could not be used: {error}
+
+Previous response:
+{response}
+
+Respond again with only the corrected JSON object.
+"""
+
+
+def duration_text(seconds: float) -> str:
+    """Describe a duration on a coarse 1-2-5 scale.
+
+    Timing noise between runs then leaves prompts, and their cache keys,
+    unchanged.
+
+    Args:
+        seconds: Measured duration.
+
+    Returns:
+        Upper bound of the duration, such as ``up to 0.2s``.
+    """
+    if seconds <= 0.01:
+        return "up to 0.01s"
+    scale = 10 ** math.floor(math.log10(seconds))
+    bound = next(step * scale for step in DURATION_STEPS if seconds <= step * scale)
+    return f"up to {bound:g}s"
+
+
+def coverage_text(coverage: Optional[float]) -> str:
+    """Describe a coverage percentage, rounded to stay stable between runs.
+
+    Args:
+        coverage: Coverage percentage, if measured.
+
+    Returns:
+        Whole percentage, or N/A.
+    """
+    return f"{coverage:.0f}%" if coverage is not None else "N/A"
+
 
 class CodeFix(BaseModel):
     """Represents a suggested code fix."""
@@ -44,6 +165,40 @@ class TestAnalysis(BaseModel):
     coverage_gaps: List[str]
 
 
+# Static instructions for structured single test analysis
+STRUCTURED_INSTRUCTIONS = f"""
+You analyze Python tests and their execution results.
+
+Provide potential issues in the test, suggestions for improvement, specific
+code fixes with the file and lines they apply to and your confidence in them
+between 0 and 1, and coverage gaps and areas needing more testing. Focus on
+test reliability, code quality, coverage and performance.
+
+Respond with only a JSON object matching this JSON schema:
+{json.dumps(TestAnalysis.model_json_schema(), indent=2)}
+"""
+
+
+# Validator for batch responses mapping test IDs to their analyses
+BATCH_ANALYSES: TypeAdapter[Dict[str, TestAnalysis]] = TypeAdapter(
+    Dict[str, TestAnalysis]
+)
+
+# Static instructions for batched analysis, sent as a cached system block
+BATCH_INSTRUCTIONS = f"""
+You analyze Python tests from one file and their execution results.
+
+For each test provide potential issues, suggestions for improvement,
+specific code fixes with the file and lines they apply to and your
+confidence in them between 0 and 1, and coverage gaps. Focus on test
+reliability, code quality, coverage and performance.
+
+Respond with only a JSON object mapping every test ID you are given to
+its analysis, matching this JSON schema:
+{json.dumps(BATCH_ANALYSES.json_schema(), indent=2)}
+"""
+
+
 class BedrockLLM:
     """AWS Bedrock LLM client with enhanced features."""
 
@@ -55,10 +210,11 @@ class BedrockLLM:
         """
         self.config = config
 
-        # Configure AWS client with retry logic
+        # Retries are handled by generate() so throttling feeds the limiter
         aws_config = Config(
             region_name=os.getenv("AWS_REGION", "us-east-1"),
-            retries={"max_attempts": 3, "mode": "adaptive"},
+            retries={"total_max_attempts": 1, "mode": "standard"},
+            max_pool_connections=max(10, config.max_concurrency),
         )
 
         # Initialize Bedrock client with credentials from environment
@@ -74,11 +230,147 @@ class BedrockLLM:
             "BEDROCK_MODEL_ID", "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
         )
 
-    async def generate(self, prompt: str) -> str:
+        # Send configured headers such as the prompt caching beta flag
+        if config.aws.headers:
+            self.client.meta.events.register(
+                "before-sign.bedrock-runtime", self._add_headers
+            )
+
+        # Replay a canned response instead of calling Bedrock, for offline use
+        stub_response = os.getenv("BEDROCK_STUB_RESPONSE")
+        if stub_response:
+            self.client = StubBedrockClient(
+                Path(stub_response).read_text(encoding="utf-8")
+            )
+
+        # Requests in flight and request rate are bounded across all callers
+        self.limiter = TokenBucket(config.requests_per_minute / 60)
+        self.semaphore = asyncio.Semaphore(max(1, config.max_concurrency))
+
+    def _add_headers(self, request: Any, **kwargs: Any) -> None:
+        """Add the configured headers to an outgoing request.
+
+        Args:
+            request: botocore request about to be signed.
+            **kwargs: Other event arguments.
+        """
+        for name, value in self.config.aws.headers.items():
+            request.headers[name] = value
+
+    def _invoke(self, request_body: Dict[str, Any]) -> str:
+        """Invoke the model synchronously.
+
+        Args:
+            request_body: Request body for Claude.
+
+        Returns:
+            Generated response.
+        """
+        response = self.client.invoke_model(
+            modelId=self.model_id,
+            body=json.dumps(request_body),
+            contentType="application/json",
+            accept="application/json",
+        )
+        response_body = json.loads(response["body"].read())
+        return response_body["content"][0]["text"]
+
+    def _invoke_stream(
+        self, request_body: Dict[str, Any], on_text: Callable[[str], None]
+    ) -> str:
+        """Invoke the model synchronously, streaming the response.
+
+        Args:
+            request_body: Request body for Claude.
+            on_text: Called with each chunk of generated text.
+
+        Returns:
+            Generated response.
+        """
+        response = self.client.invoke_model_with_response_stream(
+            modelId=self.model_id,
+            body=json.dumps(request_body),
+            contentType="application/json",
+            accept="application/json",
+        )
+        parts: List[str] = []
+        for event in response["body"]:
+            chunk = event.get("chunk")
+            if not chunk:
+                continue
+            data = json.loads(chunk["bytes"])
+            if data.get("type") == "content_block_delta":
+                text = data["delta"].get("text", "")
+                if text:
+                    parts.append(text)
+                    on_text(text)
+        return "".join(parts)
+
+    async def _invoke_with_retries(self, invoke: Callable[[], str]) -> str:
+        """Invoke the model off the event loop within the rate limits.
+
+        Throttled, transiently failing and unreachable requests are retried
+        with jittered exponential backoff; throttling also lowers the request
+        rate.
+
+        Args:
+            invoke: Blocking call invoking the model.
+
+        Returns:
+            Generated response.
+
+        Raises:
+            ClientError: If the request fails for good.
+            BotoCoreError: If the service stays unreachable.
+        """
+        attempt = 0
+        while True:
+            await self.limiter.acquire()
+            try:
+                async with self.semaphore:
+                    text = await asyncio.to_thread(invoke)
+                self.limiter.recover()
+                return text
+            except ClientError as e:
+                # Errors inside a response stream use lower camel case codes
+                code = e.response.get("Error", {}).get("Code", "")
+                code = code[:1].upper() + code[1:]
+                if code not in RETRYABLE_CODES or attempt >= self.config.max_retries:
+                    raise
+            except TRANSIENT_ERRORS as e:
+                code = type(e).__name__
+                if attempt >= self.config.max_retries:
+                    raise
+
+            if code in THROTTLING_CODES:
+                self.limiter.throttle()
+            delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+            logger.debug(f"{code}, retrying in {delay:.1f}s")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def generate(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        context: Optional[str] = None,
+        on_text: Optional[Callable[[str], None]] = None,
+        on_retry: Optional[Callable[[], None]] = None,
+    ) -> str:
         """Generate response from Claude with enhanced error handling.
 
+        The system instructions and the context are marked as cacheable, so
+        requests sharing them only pay full price for the prompt itself.
+
         Args:
             prompt: Input prompt.
+            system: Optional static instructions.
+            context: Optional context shared with other requests, sent before
+                the prompt.
+            on_text: Optional callback receiving chunks of the response as
+                they are generated, used when streaming is enabled.
+            on_retry: Optional callback called before a stream that failed
+                is requested again, whose chunks then start over.
 
         Returns:
             Generated response.
@@ -87,25 +379,47 @@ class BedrockLLM:
             LLMError: If generation fails with detailed error information.
         """
         try:
+            content: List[Dict[str, Any]] = []
+            if context:
+                content.append(
+                    {"type": "text", "text": context, "cache_control": CACHE_CONTROL}
+                )
+            content.append({"type": "text", "text": prompt})
+
             # Prepare request body for Claude
-            request_body = {
+            request_body: Dict[str, Any] = {
                 "anthropic_version": "bedrock-2023-05-31",
-                "messages": [{"role": "user", "content": prompt}],
+                "messages": [{"role": "user", "content": content}],
                 "max_tokens": self.config.max_tokens,
                 "temperature": self.config.temperature,
             }
+            if system:
+                request_body["system"] = [
+                    {"type": "text", "text": system, "cache_control": CACHE_CONTROL}
+                ]
+
+            if not self.config.stream:
+                return await self._invoke_with_retries(
+                    lambda: self._invoke(request_body)
+                )
 
-            # Invoke model
-            response = self.client.invoke_model(
-                modelId=self.model_id,
-                body=json.dumps(request_body),
-                contentType="application/json",
-                accept="application/json",
-            )
+            # Hand streamed chunks back to the event loop as they arrive
+            loop = asyncio.get_running_loop()
+
+            def emit(text: str) -> None:
+                if on_text is not None:
+                    loop.call_soon_threadsafe(on_text, text)
+
+            attempts = 0
+
+            def invoke() -> str:
+                nonlocal attempts
+                if attempts and on_retry is not None:
+                    loop.call_soon_threadsafe(on_retry)
+                attempts += 1
+                return self._invoke_stream(request_body, emit)
 
-            # Parse response
-            response_body = json.loads(response["body"].read())
-            return response_body["content"][0]["text"]
+            return await self._invoke_with_retries(invoke)
 
         except Exception as e:
             # Enhanced error handling with specific error types
@@ -138,6 +452,14 @@ class BedrockLLM:
 class LocalAnalyzer:
     """Fallback analyzer that provides basic analysis without LLM."""
 
+    def __init__(self, config: Optional[TriageConfig] = None) -> None:
+        """Initialize analyzer.
+
+        Args:
+            config: Triage rules providing the heuristic thresholds.
+        """
+        self.config = config or TriageConfig()
+
     def analyze_test(self, test: TestInfo, result: TestResult) -> TestAnalysis:
         """Analyze a test using basic heuristics.
 
@@ -155,8 +477,11 @@ class LocalAnalyzer:
         if result.status == "error":
             issues.append("Test failed with an error")
             suggestions.append("Review test setup and dependencies")
+        elif result.status == "failed":
+            issues.append(f"Test failed: {result.error_type or 'assertion failed'}")
+            suggestions.append("Review the failing assertion and the code under test")
 
-        if result.duration > 2.0:
+        if result.duration >= self.config.slow_test_seconds:
             issues.append("Test execution time is high")
             suggestions.append("Consider optimizing test performance")
 
@@ -165,11 +490,11 @@ class LocalAnalyzer:
             suggestions.append("Enable coverage reporting")
 
         # Check for common patterns
-        if result.stdout and "warning" in result.stdout.lower():
+        if has_warnings(result):
             issues.append("Test generated warnings")
             suggestions.append("Address test warnings")
 
-        if result.stderr and "deprecation" in result.stderr.lower():
+        if has_deprecations(result):
             issues.append("Test uses deprecated features")
             suggestions.append("Update deprecated functionality")
 
@@ -185,25 +510,70 @@ class LocalAnalyzer:
 class LLMAnalyzer:
     """Analyzer that uses Claude through AWS Bedrock for intelligent test analysis."""
 
-    def __init__(self, config: LLMConfig) -> None:
+    def __init__(self, config: LLMConfig, cache_dir: Optional[Path] = None) -> None:
         """Initialize analyzer with configuration.
 
         Args:
             config: Configuration for LLM and analysis.
+            cache_dir: Directory model responses are cached in, None to
+                disable caching.
         """
         self.config = config
         self.llm = BedrockLLM(config)
-        self.local = LocalAnalyzer()
+        self.local = LocalAnalyzer(config.triage)
+        self.triage = TriagePolicy(config.triage)
+        self.budget = AnalysisBudget(config.triage, config.max_concurrency)
+        self.context = ContextBuilder()
+        self.cache = (
+            ResponseCache(cache_dir, config.cache_max_mb, config.cache_max_age_days)
+            if cache_dir
+            else None
+        )
 
-    def _create_analysis_prompt(
-        self, test: TestInfo, result: TestResult, code_context: str
-    ) -> str:
-        """Create enhanced prompt for test analysis.
+        # Representative test and its analysis, shared by failures with the
+        # same signature
+        self.clusters: Dict[
+            str, Tuple[TestInfo, "asyncio.Task[Optional[TestAnalysis]]"]
+        ] = {}
+
+        # Called with test ID and issue as issues stream in, when streaming
+        self.on_issue: Optional[Callable[[str, str], None]] = None
+
+    def _instructions(self) -> str:
+        """Get the instructions for single test analysis.
+
+        Returns:
+            Instructions matching the configured response format.
+        """
+        if self.config.structured_output:
+            return STRUCTURED_INSTRUCTIONS
+        return ANALYSIS_INSTRUCTIONS
+
+    def _create_context_block(self, code_context: str) -> str:
+        """Create the code context block shared by prompts.
+
+        Args:
+            code_context: Related code context.
+
+        Returns:
+            Formatted context block.
+        """
+        return f"""
+        Code Context:
+        ```python
+        {code_context}
+        ```
+        """
+
+    def _create_analysis_prompt(self, test: TestInfo, result: TestResult) -> str:
+        """Create the per-test part of the analysis prompt.
+
+        The instructions and the code context are sent separately so they can
+        be cached across tests.
 
         Args:
             test: Test information.
             result: Test execution result.
-            code_context: Related code context.
 
         Returns:
             Formatted prompt for Claude.
@@ -219,13 +589,9 @@ class LLMAnalyzer:
 
         Test Result:
         - Status: {result.status}
-        - Duration: {result.duration:.2f}s
-        - Coverage: {result.coverage or 'N/A'}%
-
-        Code Context:
-        ```python
-        {code_context}
-        ```
+        - Duration: {duration_text(result.duration)}
+        - Coverage: {coverage_text(result.coverage)}
+        - Warnings: {self._warnings_text(result)}
 
         Execution Output:
         ```
@@ -236,44 +602,29 @@ class LLMAnalyzer:
         ```
         {result.stderr or ''}
         ```
+        """
+        return prompt
 
-        Please provide:
-        1. List of potential issues in the test
-        2. Suggestions for improvement
-        3. Specific code fixes if applicable
-        4. Coverage gaps and areas needing more testing
-
-        Focus on:
-        - Test reliability and robustness
-        - Code quality and best practices
-        - Coverage optimization
-        - Performance improvements
-
-        Format your response in sections:
-
-        Issues:
-        - Issue 1
-        - Issue 2
+    def _parse_structured_response(self, response: str) -> TestAnalysis:
+        """Validate a JSON response against the analysis model.
 
-        Suggestions:
-        - Suggestion 1
-        - Suggestion 2
+        Args:
+            response: Raw response from Claude.
 
-        Code Fixes:
-        ```python
-        # Original code
-        [original code block]
-        ```
-        ```python
-        # Suggested fix
-        [fixed code block]
-        ```
+        Returns:
+            Structured test analysis.
 
-        Coverage Gaps:
-        - Gap 1
-        - Gap 2
+        Raises:
+            LLMError: If response does not match the analysis model.
         """
-        return prompt
+        # Tolerate prose or code fences around the JSON object
+        start, end = response.find("{"), response.rfind("}")
+        if start >= 0 and end > start:
+            response = response[start : end + 1]
+        try:
+            return TestAnalysis.model_validate_json(response)
+        except ValidationError as e:
+            raise LLMError("Claude response does not match the schema", cause=e)
 
     def _parse_claude_response(self, response: str) -> TestAnalysis:
         """Parse Claude's response into structured analysis.
@@ -357,8 +708,82 @@ class LLMAnalyzer:
         except Exception as e:
             raise LLMError("Failed to parse Claude response", cause=e)
 
+    async def _generate_cached(
+        self,
+        prompt: str,
+        parse: Callable[[str], T],
+        system: str,
+        context: str,
+        repair: bool = False,
+        on_text: Optional[Callable[[str], None]] = None,
+        on_retry: Optional[Callable[[], None]] = None,
+        priority: float = 0.0,
+    ) -> T:
+        """Generate and parse a response, reusing identical earlier requests.
+
+        Requests that are not cached wait for admission by the run's budget,
+        most valuable first.
+
+        Args:
+            prompt: Input prompt.
+            parse: Function parsing the response text.
+            system: Static instructions.
+            context: Context block shared with other requests.
+            repair: Whether to ask the model once to fix a response that
+                cannot be parsed.
+            on_text: Optional callback receiving streamed response chunks.
+            on_retry: Optional callback called when a failed stream restarts.
+            priority: Value of the request, for budget admission.
+
+        Returns:
+            Parsed response.
+
+        Raises:
+            BudgetExceededError: If the request does not fit the budget.
+            LLMError: If generation or parsing fails.
+        """
+        request = system + context + prompt
+        key = request_key(self.llm.model_id, self.config.temperature, request)
+        cached = self.cache.get(key) if self.cache else None
+        if cached is not None:
+            return parse(cached)
+
+        reserved = (len(request) // CHARS_PER_TOKEN, self.config.max_tokens)
+        if not await self.budget.acquire(priority, *reserved):
+            raise BudgetExceededError("LLM budget of the run is spent")
+        used = (reserved[0], 0)
+        try:
+            response = await self.llm.generate(
+                prompt, system, context, on_text, on_retry
+            )
+            used = (used[0], len(response) // CHARS_PER_TOKEN)
+            try:
+                parsed = parse(response)
+            except LLMError as e:
+                if not repair:
+                    raise
+                logger.debug(f"Asking Claude to repair its response: {e}")
+                repair_prompt = REPAIR_PROMPT.format(error=e, response=response)
+                response = await self.llm.generate(repair_prompt, system)
+                used = (
+                    used[0] + len(system + repair_prompt) // CHARS_PER_TOKEN,
+                    used[1] + len(response) // CHARS_PER_TOKEN,
+                )
+                parsed = parse(response)
+        finally:
+            self.budget.release(reserved, used)
+
+        # Only cache responses that could be parsed
+        if self.cache:
+            self.cache.put(key, response)
+        return parsed
+
     async def analyze_test(
-        self, test: TestInfo, result: TestResult, code_context: str
+        self,
+        test: TestInfo,
+        result: TestResult,
+        code_context: str,
+        priority: float = 0.0,
     ) -> TestAnalysis:
         """Analyze a test using Claude with enhanced error handling.
 
@@ -366,6 +791,7 @@ class LLMAnalyzer:
             test: Test to analyze.
             result: Test execution result.
             code_context: Related code context.
+            priority: Value of the analysis, for budget admission.
 
         Returns:
             Test analysis results.
@@ -375,20 +801,51 @@ class LLMAnalyzer:
         """
         try:
             # Create analysis prompt
-            prompt = self._create_analysis_prompt(test, result, code_context)
+            prompt = self._create_analysis_prompt(test, result)
+
+            # Surface issues while the response is still streaming in, once
+            # even if a failed stream is retried
+            on_text: Optional[Callable[[str], None]] = None
+            on_retry: Optional[Callable[[], None]] = None
+            if self.config.stream and self.on_issue is not None:
+                parser = IssueStreamParser()
+                on_issue = self.on_issue
+
+                def surface_issues(text: str) -> None:
+                    for issue in parser.feed(text):
+                        on_issue(test.id, issue)
+
+                on_text = surface_issues
+                on_retry = parser.restart
 
             try:
                 # Try LLM analysis first
-                response = await self.llm.generate(prompt)
-                analysis = self._parse_claude_response(response)
+                analysis = await self._generate_cached(
+                    prompt,
+                    (
+                        self._parse_structured_response
+                        if self.config.structured_output
+                        else self._parse_claude_response
+                    ),
+                    self._instructions(),
+                    self._create_context_block(code_context),
+                    repair=self.config.structured_output,
+                    on_text=on_text,
+                    on_retry=on_retry,
+                    priority=priority,
+                )
                 analysis.test_id = test.id
 
                 # Update fix metadata
                 for fix in analysis.fixes:
-                    fix.file_path = test.file_path
+                    if not self.config.structured_output or not fix.file_path.name:
+                        fix.file_path = test.file_path
 
                 return analysis
 
+            except BudgetExceededError:
+                return self.local.analyze_test(test, result)
+
             except LLMError as e:
                 # Fall back to local analysis if LLM fails
                 logger.warning(
@@ -399,39 +856,422 @@ class LLMAnalyzer:
         except Exception as e:
             raise LLMError(f"Failed to analyze test {test.id}", cause=e)
 
+    async def _analyze_single(
+        self,
+        test: TestInfo,
+        result: TestResult,
+        code_context: Optional[str] = None,
+        priority: float = 0.0,
+    ) -> Optional[TestAnalysis]:
+        """Analyze a single test result with its relevant code as context.
+
+        Args:
+            test: Test information.
+            result: Test execution result.
+            code_context: Code context shared with other tests of the file,
+                built for this test alone if not given.
+            priority: Value of the analysis, for budget admission.
+
+        Returns:
+            Analysis result, or None if the analysis failed.
+        """
+        if code_context is None:
+            prompt = self._instructions() + self._create_analysis_prompt(test, result)
+            code_context = self.context.build([test], self._context_budget(prompt))
+
+        try:
+            return await self.analyze_test(test, result, code_context, priority)
+        except Exception as e:
+            logger.error(f"Failed to analyze test {test.id}: {e}")
+            return None
+
+    async def analyze_result(
+        self,
+        test: TestInfo,
+        result: TestResult,
+        code_context: Optional[str] = None,
+        weight: int = 1,
+    ) -> Optional[TestAnalysis]:
+        """Analyze a single test result as soon as it is available.
+
+        Failures with the same signature as an earlier failure reuse its
+        analysis instead of sending another request.
+
+        Args:
+            test: Test information.
+            result: Test execution result.
+            code_context: Optional code context shared with other tests.
+            weight: Number of tests sharing the analysis, raising its
+                priority within the budget.
+
+        Returns:
+            Analysis result, or None if the analysis failed.
+        """
+        priority = self.triage.priority(result, weight)
+        signature = failure_signature(test, result)
+        if signature is None:
+            return await self._analyze_single(test, result, code_context, priority)
+
+        if signature not in self.clusters:
+            task = asyncio.ensure_future(
+                self._analyze_single(test, result, code_context, priority)
+            )
+            self.clusters[signature] = (test, task)
+        representative, task = self.clusters[signature]
+
+        analysis = await task
+        if analysis is None or representative.id == test.id:
+            return analysis
+        return self._share_analysis(analysis, representative, test)
+
+    def _share_analysis(
+        self, analysis: TestAnalysis, representative: TestInfo, test: TestInfo
+    ) -> TestAnalysis:
+        """Copy the analysis of a cluster's representative to another member.
+
+        Fixes within the representative's test function refer to its own
+        lines and code, so they are dropped. Fixes to shared fixtures or
+        helpers apply to every member and are kept.
+
+        Args:
+            analysis: Analysis of the representative.
+            representative: Test the analysis was made for.
+            test: Member of the same cluster.
+
+        Returns:
+            Analysis for the member.
+        """
+        start, end = self.context.test_lines(representative)
+
+        # The model may name the test file relative to the project root
+        test_file = representative.file_path.parts
+        fixes = [
+            fix
+            for fix in analysis.fixes
+            if test_file[-len(fix.file_path.parts) :] != fix.file_path.parts
+            or fix.line_end < start
+            or fix.line_start > end
+        ]
+        return analysis.model_copy(
+            update={"test_id": test.id, "fixes": fixes}, deep=True
+        )
+
     async def analyze_results(
-        self, tests: List[TestInfo], results: Dict[str, TestResult]
+        self,
+        tests: List[TestInfo],
+        results: Dict[str, TestResult],
+        select: bool = True,
     ) -> Dict[str, TestAnalysis]:
         """Analyze multiple test results with enhanced error handling.
 
+        The triage rules decide which results are sent to Claude. Other
+        results matching a local rule are analyzed locally and results
+        matching none are skipped.
+
         Args:
             tests: List of tests.
             results: Test execution results.
+            select: Whether to apply the triage rules; if not, every test is
+                sent to Claude within the budget.
 
         Returns:
             Dictionary mapping test IDs to analysis results.
         """
-        analyses: Dict[str, TestAnalysis] = {}
-
+        pending: List[TestInfo] = []
+        local: Dict[str, TestAnalysis] = {}
         for test in tests:
             result = results.get(test.id)
-            if not result:
+            if result is None:
                 continue
+            if not select or self.triage.selects(result):
+                pending.append(test)
+            elif self.triage.findings(result):
+                local[test.id] = self.local.analyze_test(test, result)
+        if select:
+            logger.info(
+                f"Triage sent {len(pending)} of {len(tests)} tests to the LLM, "
+                f"{len(local)} analyzed locally"
+            )
 
-            # Get code context by reading test file
-            try:
-                with open(test.file_path, "r", encoding="utf-8") as f:
-                    code_context = f.read()
-            except Exception as e:
-                logger.warning(f"Failed to read test file {test.file_path}: {e}")
-                code_context = "# Failed to read test file"
+        clusters = cluster_failures(pending, results)
+        failures = sum(len(members) for members in clusters.values())
+        if failures > len(clusters):
+            logger.info(f"Analyzing {failures} failures as {len(clusters)} clusters")
+
+        if self.config.analysis_mode == "file":
+            analyses = await self._analyze_batched(pending, results, clusters)
+            return {**local, **analyses}
+
+        # Tests of a file share one cacheable code context
+        by_file: Dict[Path, List[TestInfo]] = {}
+        for test in pending:
+            by_file.setdefault(test.file_path, []).append(test)
+        contexts: Dict[Path, str] = {}
+        for file_path, file_tests in by_file.items():
+            longest = max(
+                (self._create_analysis_prompt(t, results[t.id]) for t in file_tests),
+                key=len,
+            )
+            budget = self._context_budget(self._instructions() + longest)
+            contexts[file_path] = self.context.build(file_tests, budget)
+
+        # Requests run concurrently, bounded by the client's limits and the
+        # budget, which admits the failures shared by most tests first
+        weights = {members[0].id: len(members) for members in clusters.values()}
+        analyzed = await asyncio.gather(
+            *(
+                self.analyze_result(
+                    test,
+                    results[test.id],
+                    contexts[test.file_path],
+                    weights.get(test.id, 1),
+                )
+                for test in pending
+            )
+        )
 
-            try:
-                analysis = await self.analyze_test(test, result, code_context)
-                analyses[test.id] = analysis
-            except Exception as e:
-                logger.error(f"Failed to analyze test {test.id}: {e}")
-                # Continue with next test on error
+        local.update(
+            (test.id, analysis)
+            for test, analysis in zip(pending, analyzed)
+            if analysis is not None
+        )
+        return local
+
+    def _create_batch_prompt(
+        self, tests: List[TestInfo], results: Dict[str, TestResult]
+    ) -> str:
+        """Create the per-test part of a prompt analyzing several tests at once.
+
+        Args:
+            tests: Tests of one file.
+            results: Test execution results.
+
+        Returns:
+            Formatted prompt for Claude.
+        """
+        sections = "\n".join(
+            self._batch_test_section(test, results[test.id]) for test in tests
+        )
+        return f"""
+        Please analyze these Python tests from {tests[0].file_path} and their
+        execution results.
+
+        Tests:
+        {sections}
+        """
+
+    def _warnings_text(self, result: TestResult) -> str:
+        """Summarize the warnings pytest recorded for a test.
+
+        Args:
+            result: Test execution result.
+
+        Returns:
+            Category and message of each warning, or None.
+        """
+        warnings = [f"{w['category']}: {w['message']}" for w in result.warnings]
+        return "; ".join(warnings) or "None"
+
+    def _batch_test_section(self, test: TestInfo, result: TestResult) -> str:
+        """Describe a test and its result within a batch prompt.
+
+        Args:
+            test: Test information.
+            result: Test execution result.
+
+        Returns:
+            Formatted test section.
+        """
+        return f"""
+        Test {test.id}:
+        - Line: {test.line_number}
+        - Class: {test.class_name or 'None'}
+        - Status: {result.status}
+        - Duration: {duration_text(result.duration)}
+        - Coverage: {coverage_text(result.coverage)}
+        - Warnings: {self._warnings_text(result)}
+        - Error: {result.error_type or ''} {result.error_message or ''}
+        Execution Output:
+        ```
+        {result.error_traceback or result.stdout or ''}
+        ```
+        Error Output:
+        ```
+        {result.stderr or ''}
+        ```
+        """
+
+    def _context_budget(self, prompt: str) -> int:
+        """Get the tokens left for code context in a prompt.
+
+        Args:
+            prompt: Instructions and prompt without code context.
+
+        Returns:
+            Token budget for the code context.
+        """
+        available = self.config.context_window - self.config.max_tokens
+        return available - len(prompt) // CHARS_PER_TOKEN
+
+    def _batch_chunks(
+        self, tests: List[TestInfo], results: Dict[str, TestResult]
+    ) -> List[List[TestInfo]]:
+        """Split the tests of a file into chunks that fit the context window.
+
+        Test results may use part of the prompt budget, the rest is left for
+        the code context.
+
+        Args:
+            tests: Tests of one file.
+            results: Test execution results.
+
+        Returns:
+            Chunks of tests, each holding at least one test.
+        """
+        available = self.config.context_window - self.config.max_tokens
+        budget = int(available * CHARS_PER_TOKEN * BATCH_RESULTS_SHARE)
+        base = len(BATCH_INSTRUCTIONS + self._create_batch_prompt(tests[:1], results))
+        base -= len(self._batch_test_section(tests[0], results[tests[0].id]))
+
+        chunks: List[List[TestInfo]] = []
+        size = base
+        for test in tests:
+            section = len(self._batch_test_section(test, results[test.id]))
+            if chunks and size + section <= budget:
+                chunks[-1].append(test)
+                size += section
+            else:
+                chunks.append([test])
+                size = base + section
+        return chunks
+
+    def _parse_batch_response(
+        self, response: str, tests: List[TestInfo]
+    ) -> Dict[str, TestAnalysis]:
+        """Split a batch response into per-test analyses.
+
+        Args:
+            response: Raw response from Claude.
+            tests: Tests the batch covered.
+
+        Returns:
+            Dictionary mapping test IDs to analyses, for tests the response
+            covered.
+
+        Raises:
+            LLMError: If response cannot be parsed.
+        """
+        # Tolerate prose or code fences around the JSON object
+        start, end = response.find("{"), response.rfind("}")
+        if start >= 0 and end > start:
+            response = response[start : end + 1]
+        try:
+            entries = BATCH_ANALYSES.validate_json(response)
+        except ValidationError as e:
+            raise LLMError("Claude batch response does not match the schema", cause=e)
+
+        analyses: Dict[str, TestAnalysis] = {}
+        for test in tests:
+            analysis = entries.get(test.id)
+            if analysis is None:
                 continue
+            analysis.test_id = test.id
+            for fix in analysis.fixes:
+                if not fix.file_path.name:
+                    fix.file_path = test.file_path
+            analyses[test.id] = analysis
+        return analyses
+
+    async def _analyze_batch(
+        self,
+        tests: List[TestInfo],
+        results: Dict[str, TestResult],
+        weights: Dict[str, int],
+    ) -> Dict[str, TestAnalysis]:
+        """Analyze a chunk of tests from one file with a single request.
+
+        Tests the response does not cover fall back to local analysis.
+
+        Args:
+            tests: Tests of one file.
+            results: Test execution results.
+            weights: Number of tests sharing the analysis of a test.
 
+        Returns:
+            Dictionary mapping test IDs to analyses.
+        """
+        prompt = self._create_batch_prompt(tests, results)
+        budget = self._context_budget(BATCH_INSTRUCTIONS + prompt)
+        code_context = self.context.build(tests, budget)
+        try:
+            analyses = await self._generate_cached(
+                prompt,
+                lambda response: self._parse_batch_response(response, tests),
+                BATCH_INSTRUCTIONS,
+                self._create_context_block(code_context),
+                repair=True,
+                priority=sum(
+                    self.triage.priority(results[test.id], weights.get(test.id, 1))
+                    for test in tests
+                ),
+            )
+        except BudgetExceededError:
+            analyses = {}
+        except LLMError as e:
+            logger.warning(f"LLM analysis failed, falling back to local analysis: {e}")
+            analyses = {}
+
+        for test in tests:
+            if test.id not in analyses:
+                analyses[test.id] = self.local.analyze_test(test, results[test.id])
         return analyses
+
+    async def _analyze_batched(
+        self,
+        tests: List[TestInfo],
+        results: Dict[str, TestResult],
+        clusters: Dict[str, List[TestInfo]],
+    ) -> Dict[str, TestAnalysis]:
+        """Analyze tests with one request per file or per chunk of a file.
+
+        Only one failure per cluster is sent; its analysis is copied to the
+        other members.
+
+        Args:
+            tests: Tests to analyze.
+            results: Test execution results.
+            clusters: Failed tests grouped by signature.
+
+        Returns:
+            Dictionary mapping test IDs to analysis results.
+        """
+        duplicates = {
+            member.id: members[0]
+            for members in clusters.values()
+            for member in members[1:]
+        }
+
+        by_file: Dict[Path, List[TestInfo]] = {}
+        for test in tests:
+            if test.id not in duplicates:
+                by_file.setdefault(test.file_path, []).append(test)
+
+        weights = {members[0].id: len(members) for members in clusters.values()}
+        batches = [
+            self._analyze_batch(chunk, results, weights)
+            for file_tests in by_file.values()
+            for chunk in self._batch_chunks(file_tests, results)
+        ]
+
+        analyses: Dict[str, TestAnalysis] = {}
+        for batch in await asyncio.gather(*batches):
+            analyses.update(batch)
+
+        for test in tests:
+            representative = duplicates.get(test.id)
+            if representative is not None and representative.id in analyses:
+                analyses[test.id] = self._share_analysis(
+                    analyses[representative.id], representative, test
+                )
+
+        return {test.id: analyses[test.id] for test in tests if test.id in analyses}
@@ -0,0 +1,79 @@
+"""
+Adaptive request rate limiting.
+
+Token bucket that spaces out requests to stay within the account quota and
+backs off multiplicatively when the service throttles, recovering gradually
+once requests succeed again.
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Factor applied to the rate after a throttled request
+THROTTLE_FACTOR = 0.5
+
+# Share of the configured rate regained after each successful request
+RECOVERY_STEP = 0.05
+
+# Lowest rate the bucket backs off to, as a share of the configured rate
+MIN_RATE_SHARE = 0.05
+
+
+class TokenBucket:
+    """Token bucket with additive-increase, multiplicative-decrease rate."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        """Initialize bucket, full.
+
+        Args:
+            rate: Tokens added per second, 0 or less for no limit.
+            capacity: Maximum burst size, defaults to one second worth of
+                tokens and at least one.
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        """Add the tokens accrued since the last update."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Wait until tokens are available and take them.
+
+        Tokens are reserved immediately, so concurrent callers queue up
+        behind each other without needing a lock.
+
+        Args:
+            tokens: Number of tokens to take.
+        """
+        if self.max_rate <= 0:
+            return
+        self._refill()
+        self.tokens -= tokens
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+    def throttle(self) -> None:
+        """Slow down after the service rejected a request for its rate."""
+        if self.max_rate <= 0:
+            return
+        self._refill()
+        self.rate = max(self.max_rate * MIN_RATE_SHARE, self.rate * THROTTLE_FACTOR)
+        self.tokens = min(self.tokens, 0.0)
+        logger.debug(f"Throttled, request rate lowered to {self.rate:.3f}/s")
+
+    def recover(self) -> None:
+        """Speed up again after a successful request."""
+        if self.rate < self.max_rate:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVERY_STEP)
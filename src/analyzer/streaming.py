@@ -0,0 +1,193 @@
+"""
+Streaming response support.
+
+Incrementally extracts issues from a Claude response while it is still being
+generated, and provides an offline stand-in for the Bedrock runtime client
+that replays a canned response as a stream.
+"""
+
+import io
+import json
+import re
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+# Start of the issues array in a JSON response
+ISSUES_KEY = re.compile(r'"issues"\s*:\s*\[')
+
+# Section headers of a text response
+SECTION_HEADERS = ("Issues:", "Suggestions:", "Code Fixes:", "Coverage Gaps:")
+
+
+class IssueStreamParser:
+    """Parser surfacing issues from a partial response as they complete.
+
+    Handles both the JSON format, reading the ``issues`` array one string at
+    a time, and the text format, reading the lines of the ``Issues:``
+    section. A response that is requested again after failing mid-stream
+    restarts the parser; issues surfaced by earlier attempts are not
+    surfaced again.
+    """
+
+    def __init__(self) -> None:
+        """Initialize parser with an empty buffer."""
+        self.shown: Set[str] = set()
+        self.restart()
+
+    def restart(self) -> None:
+        """Start over with a new response, remembering the issues shown."""
+        self.buffer = ""
+        self.pos = 0
+        self.json: Optional[bool] = None
+        self.section: Optional[str] = None
+        self.in_array = False
+        self.done = False
+        self.decoder = json.JSONDecoder()
+
+    def feed(self, text: str) -> List[str]:
+        """Add the next chunk of the response.
+
+        Args:
+            text: Text generated since the previous chunk.
+
+        Returns:
+            Issues completed by this chunk and not shown before.
+        """
+        self.buffer += text
+        if self.json is None:
+            stripped = self.buffer.lstrip()
+            if not stripped:
+                return []
+            self.json = stripped[0] in "{`"
+        if self.done:
+            return []
+        issues = self._feed_json() if self.json else self._feed_text()
+        fresh = [issue for issue in dict.fromkeys(issues) if issue not in self.shown]
+        self.shown.update(fresh)
+        return fresh
+
+    def _feed_text(self) -> List[str]:
+        """Read the complete lines of a text response.
+
+        Returns:
+            Issues found in the new lines.
+        """
+        issues: List[str] = []
+        while True:
+            end = self.buffer.find("\n", self.pos)
+            if end < 0:
+                return issues
+            line = self.buffer[self.pos : end].strip()
+            self.pos = end + 1
+
+            header = next((h for h in SECTION_HEADERS if line.startswith(h)), None)
+            if header is not None:
+                if self.section == "Issues:":
+                    self.done = True
+                    return issues
+                self.section = header
+            elif self.section == "Issues:" and line:
+                issues.append(line.strip("- "))
+
+    def _feed_json(self) -> List[str]:
+        """Read the complete strings of the issues array of a JSON response.
+
+        Returns:
+            Issues found in the new text.
+        """
+        if not self.in_array:
+            match = ISSUES_KEY.search(self.buffer)
+            if match is None:
+                return []
+            self.in_array = True
+            self.pos = match.end()
+
+        issues: List[str] = []
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n,":
+                self.pos += 1
+            if self.pos >= len(self.buffer):
+                return issues
+            if self.buffer[self.pos] != '"':
+                # End of the array
+                self.done = True
+                return issues
+            try:
+                issue, self.pos = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # String still incomplete
+                return issues
+            issues.append(issue)
+
+
+class StubBedrockClient:
+    """Offline stand-in for the Bedrock runtime client.
+
+    Answers every request with the same canned response, streamed in small
+    chunks in the event format of ``invoke_model_with_response_stream``.
+    """
+
+    def __init__(self, response: str, chunk_size: int = 16, delay: float = 0.0) -> None:
+        """Initialize stub client.
+
+        Args:
+            response: Response text returned for every request.
+            chunk_size: Characters per streamed chunk.
+            delay: Seconds to wait before each streamed chunk.
+        """
+        self.response = response
+        self.chunk_size = chunk_size
+        self.delay = delay
+
+    def invoke_model(self, **kwargs: Any) -> Dict[str, Any]:
+        """Return the canned response in one piece.
+
+        Args:
+            **kwargs: Request arguments, ignored.
+
+        Returns:
+            Response in the format of ``invoke_model``.
+        """
+        body = {"content": [{"type": "text", "text": self.response}]}
+        return {"body": io.BytesIO(json.dumps(body).encode("utf-8"))}
+
+    def invoke_model_with_response_stream(self, **kwargs: Any) -> Dict[str, Any]:
+        """Return the canned response as a stream of events.
+
+        Args:
+            **kwargs: Request arguments, ignored.
+
+        Returns:
+            Response in the format of ``invoke_model_with_response_stream``.
+        """
+        return {"body": self._events()}
+
+    def _events(self) -> Iterator[Dict[str, Any]]:
+        """Generate the stream events of the canned response.
+
+        Yields:
+            Stream events carrying JSON encoded message events.
+        """
+        events: List[Dict[str, Any]] = [
+            {"type": "message_start", "message": {"role": "assistant"}},
+            {"type": "content_block_start", "index": 0},
+        ]
+        size = self.chunk_size
+        events.extend(
+            {
+                "type": "content_block_delta",
+                "index": 0,
+                "delta": {"type": "text_delta", "text": self.response[i : i + size]},
+            }
+            for i in range(0, len(self.response), size)
+        )
+        events.extend(
+            [
+                {"type": "content_block_stop", "index": 0},
+                {"type": "message_stop"},
+            ]
+        )
+        for event in events:
+            if self.delay and event["type"] == "content_block_delta":
+                time.sleep(self.delay)
+            yield {"chunk": {"bytes": json.dumps(event).encode("utf-8")}}
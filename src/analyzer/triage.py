@@ -0,0 +1,265 @@
+"""
+Analysis triage.
+
+Decides with cheap local rules which test results are worth an LLM analysis,
+and spends the per-run token and cost budget on the most valuable requests
+first. Results that do not earn a request are analyzed locally.
+"""
+
+import asyncio
+import heapq
+import itertools
+from typing import List, Tuple
+
+from ..core.config import TriageConfig
+from ..core.logger import get_logger
+from ..executor.executor import TestResult
+
+logger = get_logger(__name__)
+
+# Value of an analysis for each rule a result matches
+RULE_VALUES = {
+    "error": 100.0,
+    "failed": 80.0,
+    "slow": 20.0,
+    "deprecations": 15.0,
+    "warnings": 10.0,
+}
+
+# Value of a configured status without a value of its own
+STATUS_VALUE = 50.0
+
+# Warning categories announcing deprecations
+DEPRECATION_CATEGORIES = {
+    "DeprecationWarning",
+    "PendingDeprecationWarning",
+    "FutureWarning",
+}
+
+# A waiting request: negated priority, input tokens, sequence number, output
+# tokens and the future resolved with the admission decision
+Waiter = Tuple[float, int, int, int, "asyncio.Future[bool]"]
+
+
+def has_warnings(result: TestResult) -> bool:
+    """Check whether a test emitted warnings other than deprecations.
+
+    Args:
+        result: Test execution result.
+
+    Returns:
+        Whether pytest recorded such a warning for the test.
+    """
+    return any(
+        warning["category"] not in DEPRECATION_CATEGORIES for warning in result.warnings
+    )
+
+
+def has_deprecations(result: TestResult) -> bool:
+    """Check whether a test used deprecated features.
+
+    Args:
+        result: Test execution result.
+
+    Returns:
+        Whether pytest recorded a deprecation warning for the test.
+    """
+    return any(
+        warning["category"] in DEPRECATION_CATEGORIES for warning in result.warnings
+    )
+
+
+class TriagePolicy:
+    """Local rules selecting the results sent to the LLM."""
+
+    def __init__(self, config: TriageConfig) -> None:
+        """Initialize policy.
+
+        Args:
+            config: Triage rules.
+        """
+        self.config = config
+
+    def findings(self, result: TestResult) -> List[str]:
+        """Match a result against the local rules.
+
+        Args:
+            result: Test execution result.
+
+        Returns:
+            Names of the matched rules; the status for failures and
+            configured statuses.
+        """
+        findings: List[str] = []
+        if result.status in ("failed", "error", *self.config.statuses):
+            findings.append(result.status)
+        if result.duration >= self.config.slow_test_seconds:
+            findings.append("slow")
+        if has_warnings(result):
+            findings.append("warnings")
+        if has_deprecations(result):
+            findings.append("deprecations")
+        return findings
+
+    def selects(self, result: TestResult) -> bool:
+        """Check whether a result earns an LLM analysis.
+
+        Args:
+            result: Test execution result.
+
+        Returns:
+            Whether the result matches a rule configured for the LLM.
+        """
+        earning = set(self.config.statuses)
+        if self.config.analyze_slow:
+            earning.add("slow")
+        if self.config.analyze_warnings:
+            earning.add("warnings")
+        if self.config.analyze_deprecations:
+            earning.add("deprecations")
+        return any(finding in earning for finding in self.findings(result))
+
+    def priority(self, result: TestResult, weight: int = 1) -> float:
+        """Estimate the value of analyzing a result.
+
+        Args:
+            result: Test execution result.
+            weight: Number of tests sharing the analysis, such as the members
+                of a failure cluster.
+
+        Returns:
+            Priority, higher for more valuable analyses.
+        """
+        findings = self.findings(result)
+        return weight * sum(RULE_VALUES.get(f, STATUS_VALUE) for f in findings)
+
+
+class AnalysisBudget:
+    """Priority queue spending a per-run budget on the most valuable requests.
+
+    Requests wait for one of a fixed number of slots and each free slot goes
+    to the most valuable waiting request. Admission reserves the estimated
+    tokens, which are settled with the actual usage on release. A request
+    that cannot fit the budget even once every running request has settled
+    is refused.
+    """
+
+    def __init__(self, config: TriageConfig, slots: int) -> None:
+        """Initialize budget with nothing spent.
+
+        Args:
+            config: Budget limits and token prices.
+            slots: Maximum number of admitted requests at a time.
+        """
+        self.config = config
+        self.slots = max(slots, 1)
+        self.running = 0
+        self.tokens = 0
+        self.cost = 0.0
+        self.refused = 0
+        self.waiting: List[Waiter] = []
+        self.counter = itertools.count()
+
+    def price(self, input_tokens: int, output_tokens: int) -> float:
+        """Compute the cost of tokens.
+
+        Args:
+            input_tokens: Prompt tokens.
+            output_tokens: Generated tokens.
+
+        Returns:
+            Cost in USD.
+        """
+        return (
+            input_tokens * self.config.input_cost_per_mtok
+            + output_tokens * self.config.output_cost_per_mtok
+        ) / 1_000_000
+
+    def _fits(self, input_tokens: int, output_tokens: int) -> bool:
+        """Check whether a request fits the remaining budget.
+
+        Args:
+            input_tokens: Estimated prompt tokens.
+            output_tokens: Estimated generated tokens.
+
+        Returns:
+            Whether the request stays within the limits.
+        """
+        max_tokens = self.config.max_run_tokens
+        if max_tokens and self.tokens + input_tokens + output_tokens > max_tokens:
+            return False
+        max_cost = self.config.max_run_cost
+        price = self.price(input_tokens, output_tokens)
+        return not max_cost or self.cost + price <= max_cost
+
+    def _charge(self, input_tokens: int, output_tokens: int) -> None:
+        """Add tokens to the spending, negative amounts refund them.
+
+        Args:
+            input_tokens: Prompt tokens.
+            output_tokens: Generated tokens.
+        """
+        self.tokens += input_tokens + output_tokens
+        self.cost += self.price(input_tokens, output_tokens)
+
+    def _dispatch(self) -> None:
+        """Admit or refuse waiting requests, most valuable first."""
+        while self.waiting and self.running < self.slots:
+            _, input_tokens, _, output_tokens, future = self.waiting[0]
+            if future.done():
+                heapq.heappop(self.waiting)
+                continue
+            if self._fits(input_tokens, output_tokens):
+                heapq.heappop(self.waiting)
+                self.running += 1
+                self._charge(input_tokens, output_tokens)
+                future.set_result(True)
+            elif self.running > 0:
+                # Running requests may still return part of their reservation
+                return
+            else:
+                heapq.heappop(self.waiting)
+                if not self.refused:
+                    logger.info("LLM budget spent, falling back to local analysis")
+                self.refused += 1
+                future.set_result(False)
+
+    async def acquire(
+        self, priority: float, input_tokens: int, output_tokens: int
+    ) -> bool:
+        """Wait for a slot and reserve the estimated tokens of a request.
+
+        Args:
+            priority: Value of the request.
+            input_tokens: Estimated prompt tokens.
+            output_tokens: Maximum generated tokens.
+
+        Returns:
+            Whether the request was admitted; admitted requests must call
+            ``release`` once done.
+        """
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[bool]" = loop.create_future()
+        heapq.heappush(
+            self.waiting,
+            (-priority, input_tokens, next(self.counter), output_tokens, future),
+        )
+        # Let requests started together queue up before picking among them
+        loop.call_soon(self._dispatch)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.result():
+                self.release((input_tokens, output_tokens), (0, 0))
+            raise
+
+    def release(self, reserved: Tuple[int, int], used: Tuple[int, int]) -> None:
+        """Free the slot of an admitted request and settle its reservation.
+
+        Args:
+            reserved: Input and output tokens reserved on admission.
+            used: Input and output tokens actually used.
+        """
+        self.running -= 1
+        self._charge(used[0] - reserved[0], used[1] - reserved[1])
+        self._dispatch()
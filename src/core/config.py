@@ -17,10 +17,18 @@ class TestConfig(BaseModel):
 
     python_path: str = "python3"
     test_paths: List[str] = []
+    source_roots: List[str] = ["."]  # Roots for resolving imports to files
     exclude_patterns: List[str] = ["__pycache__", ".pytest_cache"]
-    parallel_jobs: int = 0
+    scan_workers: int = 0  # Processes for cold scans, 0 for CPU count, 1 serial
+    parallel_jobs: int = 0  # Max concurrent test processes, 0 for CPU count
+    min_free_memory_mb: int = 0  # Hold back new processes below this, 0 to disable
     timeout: int = 300
     coverage_target: float = 95.0
+    execution_mode: str = "test"  # "test", "file" (batched) or "worker" (warm pool)
+    shard_size: int = 0  # Max tests per batched pytest run, 0 for whole files
+    output_head_kb: int = 32  # Captured output kept from the start, 0 for all
+    output_tail_kb: int = 32  # Captured output kept from the end
+    spill_output: bool = False  # Keep complete output gzipped under cache_dir
 
 
 class VSCodeConfig(BaseModel):
@@ -43,12 +51,35 @@ class AWSConfig(BaseModel):
     )
 
 
+class TriageConfig(BaseModel):
+    """Rules deciding which test results are worth an LLM analysis."""
+
+    statuses: List[str] = ["failed", "error"]  # Results always sent to the LLM
+    slow_test_seconds: float = 2.0  # Duration from which a test counts as slow
+    analyze_slow: bool = False  # Send slow tests to the LLM
+    analyze_warnings: bool = False  # Send tests emitting warnings to the LLM
+    analyze_deprecations: bool = False  # Send tests using deprecated features
+    max_run_tokens: int = 0  # Token budget of a run, 0 for unlimited
+    max_run_cost: float = 0.0  # Cost budget of a run in USD, 0 for unlimited
+    input_cost_per_mtok: float = 3.0  # USD per million input tokens
+    output_cost_per_mtok: float = 15.0  # USD per million output tokens
+
+
 class LLMConfig(BaseModel):
     """LLM configuration."""
 
     temperature: float = 0.0
     max_tokens: int = 8192
     context_window: int = 100000
+    analysis_mode: str = "test"  # "test" or "file" (one prompt per test file)
+    structured_output: bool = True  # Request JSON validated against TestAnalysis
+    stream: bool = False  # Stream responses and show issues as they arrive
+    max_concurrency: int = 4  # Max Bedrock requests in flight
+    requests_per_minute: float = 60.0  # Request quota of the account, 0 for no limit
+    max_retries: int = 6  # Retries of throttled requests
+    cache_max_mb: float = 100.0  # Size limit of the response cache
+    cache_max_age_days: float = 30.0  # Age after which cached responses expire
+    triage: TriageConfig = TriageConfig()
     aws: AWSConfig
 
 
@@ -98,12 +129,30 @@ def load_config(config_path: Optional[Union[str, Path]] = None) -> RadarConfig:
     config_data["test"]["parallel_jobs"] = int(
         os.getenv("TEST_PARALLEL_JOBS", str(config_data["test"]["parallel_jobs"]))
     )
+    config_data["test"]["min_free_memory_mb"] = int(
+        os.getenv(
+            "TEST_MIN_FREE_MEMORY_MB",
+            str(config_data["test"].get("min_free_memory_mb", 0)),
+        )
+    )
     config_data["test"]["timeout"] = int(
         os.getenv("TEST_TIMEOUT", str(config_data["test"]["timeout"]))
     )
     config_data["test"]["coverage_target"] = float(
         os.getenv("TEST_COVERAGE_TARGET", str(config_data["test"]["coverage_target"]))
     )
+    config_data["test"]["execution_mode"] = os.getenv(
+        "TEST_EXECUTION_MODE", config_data["test"].get("execution_mode", "test")
+    )
+    config_data["test"]["shard_size"] = int(
+        os.getenv("TEST_SHARD_SIZE", str(config_data["test"].get("shard_size", 0)))
+    )
+    config_data["test"]["spill_output"] = (
+        os.getenv(
+            "TEST_SPILL_OUTPUT", str(config_data["test"].get("spill_output", False))
+        ).lower()
+        == "true"
+    )
 
     config_data["vscode"]["auto_discover"] = (
         os.getenv("VSCODE_AUTO_DISCOVER", "true").lower() == "true"
@@ -144,6 +193,31 @@ def load_config(config_path: Optional[Union[str, Path]] = None) -> RadarConfig:
     config_data["llm"]["context_window"] = int(
         os.getenv("LLM_CONTEXT_WINDOW", str(config_data["llm"]["context_window"]))
     )
+    config_data["llm"]["analysis_mode"] = os.getenv(
+        "LLM_ANALYSIS_MODE", config_data["llm"].get("analysis_mode", "test")
+    )
+    config_data["llm"]["stream"] = (
+        os.getenv("LLM_STREAM", str(config_data["llm"].get("stream", False))).lower()
+        == "true"
+    )
+    config_data["llm"]["max_concurrency"] = int(
+        os.getenv(
+            "LLM_MAX_CONCURRENCY", str(config_data["llm"].get("max_concurrency", 4))
+        )
+    )
+    config_data["llm"]["requests_per_minute"] = float(
+        os.getenv(
+            "LLM_REQUESTS_PER_MINUTE",
+            str(config_data["llm"].get("requests_per_minute", 60.0)),
+        )
+    )
+    triage = config_data["llm"].setdefault("triage", {})
+    triage["max_run_tokens"] = int(
+        os.getenv("LLM_MAX_RUN_TOKENS", str(triage.get("max_run_tokens", 0)))
+    )
+    triage["max_run_cost"] = float(
+        os.getenv("LLM_MAX_RUN_COST", str(triage.get("max_run_cost", 0.0)))
+    )
 
     config_data["log_level"] = os.getenv("LOG_LEVEL", config_data["log_level"])
     config_data["cache_dir"] = os.getenv("CACHE_DIR", config_data["cache_dir"])
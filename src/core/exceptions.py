@@ -243,6 +243,12 @@ class AnalysisError(LLMError):
         return self.message
 
 
+class BudgetExceededError(LLMError):
+    """LLM request refused because the run's token or cost budget is spent."""
+
+    pass
+
+
 class APIError(RadarError):
     """Error in API operations."""
 
@@ -0,0 +1,166 @@
+"""
+Bounded output capture.
+
+Keeps only the beginning and the end of captured test output, replacing the
+middle with a marker, so heavy logging cannot blow up memory, reports or
+prompts. The complete output can optionally be spilled to a compressed file.
+"""
+
+import asyncio
+import gzip
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Size of the chunks read from process pipes
+READ_CHUNK = 64 * 1024
+
+# Marker replacing the dropped middle of an output
+ELIDED_MARKER = "\n... [{count} bytes elided] ...\n"
+
+
+def bound_text(text: Optional[str], head: int, tail: int) -> Optional[str]:
+    """Keep the head and tail of an already captured text.
+
+    Args:
+        text: Captured text.
+        head: Characters kept from the start, 0 to keep everything.
+        tail: Characters kept from the end.
+
+    Returns:
+        Bounded text.
+    """
+    if not text or head <= 0 or len(text) <= head + tail:
+        return text
+    elided = len(text) - head - tail
+    return text[:head] + ELIDED_MARKER.format(count=elided) + text[len(text) - tail :]
+
+
+class BoundedOutput:
+    """Capture buffer holding the head and a rolling tail of a stream."""
+
+    def __init__(self, head: int, tail: int, spill_path: Optional[Path] = None) -> None:
+        """Initialize capture buffer.
+
+        Args:
+            head: Bytes kept from the start, 0 to keep everything.
+            tail: Bytes kept from the end.
+            spill_path: Optional gzip file receiving the complete output.
+        """
+        self.head_size = head
+        self.tail_size = tail
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+        self.spill_path = spill_path
+        self.spill: Optional[gzip.GzipFile] = None
+        if spill_path is not None:
+            spill_path.parent.mkdir(parents=True, exist_ok=True)
+            self.spill = gzip.open(spill_path, "wb", compresslevel=6)
+
+    @property
+    def spill_file(self) -> Optional[str]:
+        """Path of the spill file, if the output is spilled."""
+        return str(self.spill_path) if self.spill_path else None
+
+    def write(self, data: bytes) -> None:
+        """Add captured data.
+
+        Args:
+            data: Next chunk of the stream.
+        """
+        if self.spill is not None:
+            self.spill.write(data)
+        self.total += len(data)
+
+        if self.head_size <= 0:
+            self.head += data
+            return
+
+        room = self.head_size - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data and self.tail_size > 0:
+            self.tail += data
+            if len(self.tail) > self.tail_size:
+                del self.tail[: len(self.tail) - self.tail_size]
+
+    def close(self) -> None:
+        """Finish the spill file, if any."""
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
+
+    def getvalue(self) -> str:
+        """Get the captured text.
+
+        Returns:
+            Head and tail of the output, with a marker where data was dropped.
+        """
+        head = self.head.decode("utf-8", errors="replace")
+        elided = self.total - len(self.head) - len(self.tail)
+        if elided <= 0:
+            return head + self.tail.decode("utf-8", errors="replace")
+        tail = self.tail.decode("utf-8", errors="replace")
+        return head + ELIDED_MARKER.format(count=elided) + tail
+
+
+async def drain(stream: Optional[asyncio.StreamReader], output: BoundedOutput) -> None:
+    """Read a process pipe into a capture buffer until it closes.
+
+    Args:
+        stream: Pipe of the process.
+        output: Capture buffer.
+    """
+    if stream is None:
+        return
+    while True:
+        chunk = await stream.read(READ_CHUNK)
+        if not chunk:
+            break
+        output.write(chunk)
+
+
+async def read_records(
+    stream: asyncio.StreamReader, records: List[Dict[str, Any]]
+) -> None:
+    """Read JSON line records from a pipe until it closes.
+
+    Records longer than the limit of the stream are skipped, so the tests
+    they belong to are filled in as errors instead of failing the shard.
+
+    Args:
+        stream: Pipe the records are written to.
+        records: Decoded records, appended to in place.
+    """
+    skipping = False
+    while True:
+        try:
+            line = await stream.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            # Closed, possibly after an unterminated last record
+            line = e.partial
+            if not line:
+                break
+        except asyncio.LimitOverrunError as e:
+            # Drop the buffered part of the record and read on to its end
+            await stream.readexactly(e.consumed)
+            if not skipping:
+                logger.warning("Skipped a test result record over the size limit")
+            skipping = True
+            continue
+
+        if skipping:
+            skipping = False
+            continue
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipped a malformed test result record: {e}")
+        if not line.endswith(b"\n"):
+            break
@@ -0,0 +1,185 @@
+"""
+Per-test coverage collection.
+
+Every execution unit writes its own coverage data file, recording one
+dynamic context per test, so concurrent pytest processes never share a data
+file. The lines of each test are read from its unit's file as soon as the
+unit finishes, and the unit files are combined once after the run into a
+single data file giving the per-file coverage.
+"""
+
+import shutil
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+import coverage
+
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Pytest arguments measuring coverage with one context per test and no report
+COVERAGE_ARGS = ["--cov", "--cov-context=test", "--cov-report="]
+
+# Lines covered, by file
+FileLines = Dict[str, Set[int]]
+
+
+def context_node_id(context: str) -> Optional[str]:
+    """Get the pytest node ID a coverage context was recorded for.
+
+    Args:
+        context: Context name, such as ``test_x.py::test_a|run``.
+
+    Returns:
+        Node ID, or None for lines run outside of tests, e.g. on import.
+    """
+    return context.rsplit("|", 1)[0] or None
+
+
+class CoverageCollector:
+    """Collects per-test coverage of a run from per-unit data files."""
+
+    def __init__(self, data_dir: Path, omit: Iterable[Path] = ()) -> None:
+        """Initialize collector.
+
+        Args:
+            data_dir: Directory holding the data files of the run.
+            omit: Files measured along the tests but not part of the project,
+                such as the pytest plugin of the executor.
+        """
+        self.data_dir = Path(data_dir)
+        self.omit = {str(Path(path).resolve()) for path in omit}
+        self.unit_files: List[Path] = []
+        self.statements: Dict[str, Set[int]] = {}
+
+        # Coverage matrix of the run: lines by test ID, percentage by file
+        self.tests: Dict[str, FileLines] = {}
+        self.files: Dict[str, float] = {}
+        self.total: Optional[float] = None
+        self.analyzer = coverage.Coverage(data_file=None)
+
+    def reset(self) -> None:
+        """Discard the data of a previous run."""
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+        self.unit_files = []
+        self.tests = {}
+        self.files = {}
+        self.total = None
+
+    def unit_file(self, name: str) -> Path:
+        """Get the data file of an execution unit.
+
+        Each unit gets a directory of its own, because pytest-cov combines
+        the data files it finds next to its own.
+
+        Args:
+            name: Name unique to the unit.
+
+        Returns:
+            Path to pass as ``COVERAGE_FILE``.
+        """
+        unit_dir = self.data_dir / name
+        unit_dir.mkdir(parents=True, exist_ok=True)
+        data_file = unit_dir / ".coverage"
+        self.unit_files.append(data_file)
+        return data_file
+
+    def _statements(self, filename: str) -> Set[int]:
+        """Get the executable lines of a source file, once.
+
+        Args:
+            filename: Measured source file.
+
+        Returns:
+            Line numbers of the statements.
+        """
+        if filename not in self.statements:
+            try:
+                self.statements[filename] = set(self.analyzer.analysis2(filename)[1])
+            except Exception as e:
+                logger.debug(f"Failed to analyze {filename} for coverage: {e}")
+                self.statements[filename] = set()
+        return self.statements[filename]
+
+    def percentage(self, lines: FileLines) -> Optional[float]:
+        """Compute the coverage of the files a set of lines touches.
+
+        Args:
+            lines: Covered lines by file.
+
+        Returns:
+            Percentage of statements covered, or None without statements.
+        """
+        total = covered = 0
+        for filename, file_lines in lines.items():
+            statements = self._statements(filename)
+            total += len(statements)
+            covered += len(statements & file_lines)
+        return 100.0 * covered / total if total else None
+
+    def read_unit(self, data_file: Path) -> Dict[str, FileLines]:
+        """Read the lines each test of a unit covered.
+
+        Lines run outside of tests, such as module imports, are shared by
+        every test of the unit, as they would be in a run of the test alone.
+
+        Args:
+            data_file: Data file of the unit.
+
+        Returns:
+            Dictionary mapping node IDs to the lines they covered.
+        """
+        if not data_file.exists():
+            return {}
+        data = coverage.CoverageData(str(data_file))
+        data.read()
+
+        shared: FileLines = {}
+        tests: Dict[str, FileLines] = {}
+        for filename in data.measured_files():
+            if filename in self.omit:
+                continue
+            for line, contexts in data.contexts_by_lineno(filename).items():
+                for context in contexts:
+                    node_id = context_node_id(context)
+                    target = tests.setdefault(node_id, {}) if node_id else shared
+                    target.setdefault(filename, set()).add(line)
+
+        for lines in tests.values():
+            for filename, file_lines in shared.items():
+                lines.setdefault(filename, set()).update(file_lines)
+        return tests
+
+    def combine(self) -> Optional[Path]:
+        """Combine the unit data files of the run into one.
+
+        Returns:
+            Path of the combined data file, or None if nothing was measured.
+        """
+        unit_files = [path for path in self.unit_files if path.exists()]
+        if not unit_files:
+            return None
+
+        data_file = self.data_dir / ".coverage"
+        combined = coverage.Coverage(data_file=str(data_file))
+        combined.combine([str(path) for path in unit_files], keep=False)
+        combined.save()
+
+        data = combined.get_data()
+        total = covered = 0
+        for filename in data.measured_files():
+            if filename in self.omit:
+                continue
+            statements = self._statements(filename)
+            executed = statements & set(data.lines(filename) or [])
+            if statements:
+                self.files[filename] = 100.0 * len(executed) / len(statements)
+            total += len(statements)
+            covered += len(executed)
+        self.total = 100.0 * covered / total if total else None
+
+        for path in unit_files:
+            shutil.rmtree(path.parent, ignore_errors=True)
+        self.unit_files = []
+        return data_file
@@ -0,0 +1,312 @@
+"""
+Persistent coverage index.
+
+Stores the lines each test covers as one bitmap per file, in a compact
+binary file. The inverse mapping from lines to the tests covering them is
+built per file on first use, so impact and coverage gap queries are
+answered without re-reading coverage data.
+"""
+
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Bump when the binary layout changes
+INDEX_VERSION = 1
+
+# File signature preceding the version
+MAGIC = b"TRCX"
+
+# Lines covered, by file
+FileLines = Dict[str, Set[int]]
+
+
+def to_bitmap(lines: Set[int]) -> int:
+    """Encode line numbers as a bitmap.
+
+    Args:
+        lines: Line numbers.
+
+    Returns:
+        Integer with the bit of each line number set.
+    """
+    bitmap = 0
+    for line in lines:
+        bitmap |= 1 << line
+    return bitmap
+
+
+def from_bitmap(bitmap: int) -> Set[int]:
+    """Decode a bitmap into line numbers.
+
+    Args:
+        bitmap: Integer with the bit of each line number set.
+
+    Returns:
+        Line numbers.
+    """
+    lines: Set[int] = set()
+    while bitmap:
+        low = bitmap & -bitmap
+        lines.add(low.bit_length() - 1)
+        bitmap ^= low
+    return lines
+
+
+class CoverageIndex:
+    """Index of the lines covered by each test and the tests covering a line."""
+
+    def __init__(self, cache_dir: Optional[Path] = None) -> None:
+        """Initialize index, loading it from disk if available.
+
+        Args:
+            cache_dir: Directory the index is persisted in, None to keep it
+                in memory only.
+        """
+        self.path = Path(cache_dir) / "coverage_index.bin" if cache_dir else None
+        self.tests: List[str] = []
+        self.test_ids: Dict[str, int] = {}
+
+        # Bitmaps by file: statements, and covered lines by test number
+        self.statements: Dict[str, int] = {}
+        self.covered: Dict[str, Dict[int, int]] = {}
+
+        # Tests covering each line, as bitmaps of test numbers, per file
+        self.inverse: Dict[str, Dict[int, int]] = {}
+        self.dirty = False
+        self.load()
+
+    def _key(self, file_path: str) -> str:
+        """Normalize a file path to the form coverage records.
+
+        Args:
+            file_path: Path of a source file.
+
+        Returns:
+            Absolute path.
+        """
+        return os.path.abspath(file_path)
+
+    def _test_number(self, test_id: str) -> int:
+        """Get the number of a test, registering it if new.
+
+        Args:
+            test_id: Test ID.
+
+        Returns:
+            Position of the test in the test table.
+        """
+        number = self.test_ids.get(test_id)
+        if number is None:
+            number = len(self.tests)
+            self.tests.append(test_id)
+            self.test_ids[test_id] = number
+        return number
+
+    def update(
+        self, tests: Dict[str, FileLines], statements: Dict[str, Set[int]]
+    ) -> None:
+        """Replace the coverage of the tests of a run.
+
+        Tests that did not run keep their previous coverage.
+
+        Args:
+            tests: Lines covered by test ID.
+            statements: Executable lines of the measured files.
+        """
+        numbers = {self._test_number(test_id) for test_id in tests}
+        for covered in self.covered.values():
+            for number in numbers & covered.keys():
+                del covered[number]
+
+        for test_id, lines in tests.items():
+            number = self.test_ids[test_id]
+            for file_path, file_lines in lines.items():
+                if file_lines:
+                    covered = self.covered.setdefault(self._key(file_path), {})
+                    covered[number] = to_bitmap(file_lines)
+
+        for file_path, file_statements in statements.items():
+            if file_statements:
+                self.statements[self._key(file_path)] = to_bitmap(file_statements)
+
+        self.covered = {key: value for key, value in self.covered.items() if value}
+        self.inverse = {}
+        self.dirty = True
+
+    def _line_tests(self, key: str) -> Dict[int, int]:
+        """Get the tests covering each line of a file, built once.
+
+        Args:
+            key: Normalized file path.
+
+        Returns:
+            Dictionary mapping line numbers to bitmaps of test numbers.
+        """
+        if key not in self.inverse:
+            inverse: Dict[int, int] = {}
+            for number, bitmap in self.covered.get(key, {}).items():
+                for line in from_bitmap(bitmap):
+                    inverse[line] = inverse.get(line, 0) | 1 << number
+            self.inverse[key] = inverse
+        return self.inverse[key]
+
+    def tests_covering(self, file_path: str, line: Optional[int] = None) -> List[str]:
+        """Find the tests covering a line, or any line of a file.
+
+        Args:
+            file_path: Path of a source file.
+            line: Line number, None for the whole file.
+
+        Returns:
+            Test IDs, in the order tests were first indexed.
+        """
+        key = self._key(file_path)
+        if line is None:
+            numbers = sorted(self.covered.get(key, {}))
+        else:
+            numbers = sorted(from_bitmap(self._line_tests(key).get(line, 0)))
+        return [self.tests[number] for number in numbers]
+
+    def coverage_of(self, test_id: str) -> FileLines:
+        """Get the lines a test covers.
+
+        Args:
+            test_id: Test ID.
+
+        Returns:
+            Covered lines by file, empty if the test is not indexed.
+        """
+        number = self.test_ids.get(test_id)
+        if number is None:
+            return {}
+        return {
+            key: from_bitmap(covered[number])
+            for key, covered in self.covered.items()
+            if number in covered
+        }
+
+    def missing_lines(self, file_path: str) -> Set[int]:
+        """Find the statements of a file no indexed test covers.
+
+        Args:
+            file_path: Path of a source file.
+
+        Returns:
+            Uncovered line numbers, empty for files that were never measured.
+        """
+        key = self._key(file_path)
+        covered = 0
+        for bitmap in self.covered.get(key, {}).values():
+            covered |= bitmap
+        return from_bitmap(self.statements.get(key, 0) & ~covered)
+
+    def _encode(self) -> bytes:
+        """Serialize the index.
+
+        Returns:
+            Uncompressed binary payload.
+        """
+        parts: List[bytes] = []
+
+        def add_text(text: str) -> None:
+            data = text.encode("utf-8")
+            parts.append(struct.pack("<I", len(data)))
+            parts.append(data)
+
+        def add_bitmap(bitmap: int) -> None:
+            data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+            parts.append(struct.pack("<I", len(data)))
+            parts.append(data)
+
+        parts.append(struct.pack("<I", len(self.tests)))
+        for test_id in self.tests:
+            add_text(test_id)
+
+        keys = sorted(self.statements.keys() | self.covered.keys())
+        parts.append(struct.pack("<I", len(keys)))
+        for key in keys:
+            add_text(key)
+            add_bitmap(self.statements.get(key, 0))
+            covered = self.covered.get(key, {})
+            parts.append(struct.pack("<I", len(covered)))
+            for number, bitmap in sorted(covered.items()):
+                parts.append(struct.pack("<I", number))
+                add_bitmap(bitmap)
+        return b"".join(parts)
+
+    def _decode(self, payload: bytes) -> None:
+        """Load a serialized index.
+
+        Args:
+            payload: Uncompressed binary payload.
+        """
+        view = memoryview(payload)
+        offset = 0
+
+        def read_int() -> int:
+            nonlocal offset
+            value: int = struct.unpack_from("<I", view, offset)[0]
+            offset += 4
+            return value
+
+        def read_bytes() -> bytes:
+            nonlocal offset
+            size = read_int()
+            data = bytes(view[offset : offset + size])
+            offset += size
+            return data
+
+        tests = [read_bytes().decode("utf-8") for _ in range(read_int())]
+        statements: Dict[str, int] = {}
+        covered: Dict[str, Dict[int, int]] = {}
+        for _ in range(read_int()):
+            key = read_bytes().decode("utf-8")
+            statements[key] = int.from_bytes(read_bytes(), "little")
+            file_covered: Dict[int, int] = {}
+            for _ in range(read_int()):
+                number = read_int()
+                file_covered[number] = int.from_bytes(read_bytes(), "little")
+            if file_covered:
+                covered[key] = file_covered
+
+        self.tests = tests
+        self.test_ids = {test_id: number for number, test_id in enumerate(tests)}
+        self.statements = {key: value for key, value in statements.items() if value}
+        self.covered = covered
+        self.inverse = {}
+
+    def load(self) -> None:
+        """Load the index, discarding missing, corrupt or outdated files."""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            data = self.path.read_bytes()
+            magic, version = struct.unpack_from("<4sH", data)
+            if magic == MAGIC and version == INDEX_VERSION:
+                self._decode(zlib.decompress(data[struct.calcsize("<4sH") :]))
+        except Exception as e:
+            logger.warning(f"Failed to load coverage index {self.path}: {e}")
+            self.tests, self.test_ids = [], {}
+            self.statements, self.covered, self.inverse = {}, {}, {}
+
+    def save(self) -> None:
+        """Persist the index if it changed."""
+        if not self.path or not self.dirty:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(struct.pack("<4sH", MAGIC, INDEX_VERSION))
+                f.write(zlib.compress(self._encode(), 6))
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except Exception as e:
+            logger.warning(f"Failed to save coverage index {self.path}: {e}")
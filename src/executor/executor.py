@@ -5,19 +5,44 @@ Handles parallel test execution and result collection.
 """
 
 import asyncio
-import concurrent.futures
+import hashlib
+import os
 import subprocess
+import tempfile
 import time
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from ..core.config import TestConfig
 from ..core.exceptions import ExecutionError
 from ..core.logger import get_logger
 from ..scanner.scanner import TestInfo
+from .capture import BoundedOutput, bound_text, drain, read_records
+from .coverage_data import COVERAGE_ARGS, CoverageCollector
+from .coverage_index import CoverageIndex
+from .pool import OUTPUT_LIMITS_ENV, STREAM_LIMIT, WorkerPool
+from .scheduler import Scheduler
+from .timings import DurationHistory
 
 logger = get_logger(__name__)
 
+# Status precedence used when several pytest items (e.g. parametrized cases)
+# map onto the same discovered test.
+STATUS_PRIORITY = {"error": 3, "failed": 2, "passed": 1, "skipped": 0}
+
+# Resource usage fields of results, summed when merging items of one test
+USAGE_FIELDS = ("cpu_user", "cpu_system", "io_read", "io_write")
+
+# Script running pytest with the result plugin, and the variable naming the
+# descriptor it reports on (see ``result_plugin.RESULT_FD_ENV``)
+RESULT_PLUGIN = Path(__file__).with_name("result_plugin.py")
+RESULT_FD_ENV = "TEST_RADAR_RESULT_FD"
+
+# Seconds a pytest run gets for interpreter startup and collection, on top of
+# the timeout of each of its tests
+STARTUP_ALLOWANCE = 10.0
+
 
 @dataclass
 class TestResult:
@@ -32,21 +57,276 @@ class TestResult:
     error_message: Optional[str] = None
     error_type: Optional[str] = None
     error_traceback: Optional[str] = None
+    stdout_file: Optional[str] = None  # Compressed complete output, if spilled
+    stderr_file: Optional[str] = None
+    setup_duration: float = 0.0  # Phases making up the duration, in seconds
+    call_duration: float = 0.0
+    teardown_duration: float = 0.0
+    cpu_user: Optional[float] = None  # CPU seconds, if measured
+    cpu_system: Optional[float] = None
+    max_rss: Optional[int] = None  # Peak resident set size of the process, bytes
+    io_read: Optional[int] = None  # Block input and output operations
+    io_write: Optional[int] = None
+    warnings: List[Dict[str, str]] = field(default_factory=list)  # Category, message
 
 
 class TestExecutor:
     """Executor for running tests in parallel."""
 
-    def __init__(self, config: TestConfig) -> None:
+    def __init__(self, config: TestConfig, cache_dir: Optional[Path] = None) -> None:
         """Initialize executor with configuration.
 
         Args:
             config: Test configuration.
+            cache_dir: Optional directory for persisted test durations,
+                spilled output and coverage data.
         """
         self.config = config
-        self.executor = concurrent.futures.ThreadPoolExecutor(
-            max_workers=self.config.parallel_jobs or None
+        self.history = DurationHistory(cache_dir)
+        self.pool: Optional[WorkerPool] = None
+        self.output_dir = (
+            Path(cache_dir) / "output" if cache_dir and config.spill_output else None
         )
+        self.coverage: Optional[CoverageCollector] = None
+        self.coverage_index: Optional[CoverageIndex] = None
+        if config.coverage_target > 0:
+            self.coverage = CoverageCollector(
+                (
+                    Path(cache_dir) / "coverage"
+                    if cache_dir
+                    else Path(tempfile.mkdtemp(prefix="test-radar-coverage-"))
+                ),
+                omit=[RESULT_PLUGIN],
+            )
+            self.coverage_index = CoverageIndex(cache_dir)
+
+    def _scheduler(self) -> Scheduler:
+        """Create a scheduler honoring the current concurrency settings.
+
+        Returns:
+            Scheduler limited to ``parallel_jobs`` (default: CPU count).
+        """
+        return Scheduler(
+            self.config.parallel_jobs or None, self.config.min_free_memory_mb
+        )
+
+    def _node_id(self, test: TestInfo) -> str:
+        """Build the pytest node ID for a test.
+
+        Args:
+            test: Test to address.
+
+        Returns:
+            Node ID in ``path::Class::function`` form.
+        """
+        parts = [str(test.file_path)]
+        if test.class_name:
+            parts.append(test.class_name)
+        parts.append(test.function_name)
+        return "::".join(parts)
+
+    def _base_command(self) -> List[str]:
+        """Build the pytest command shared by all execution modes.
+
+        Returns:
+            Command line without test selection.
+        """
+        cmd = [
+            self.config.python_path,
+            str(RESULT_PLUGIN),
+            "-v",
+            "--tb=short",
+            f"--timeout={self.config.timeout}",
+            "--capture=tee-sys",
+        ]
+
+        # Add coverage if enabled, recorded per test instead of reported
+        if self.coverage is not None:
+            cmd.extend(COVERAGE_ARGS)
+
+        return cmd
+
+    def _environment(self, name: str, result_fd: int) -> Dict[str, str]:
+        """Build the environment of a pytest run.
+
+        Args:
+            name: Name unique to the run, naming its coverage data file.
+            result_fd: Descriptor the result plugin reports on.
+
+        Returns:
+            Environment for the subprocess.
+        """
+        head = self.config.output_head_kb * 1024
+        tail = self.config.output_tail_kb * 1024
+        env = {
+            **os.environ,
+            RESULT_FD_ENV: str(result_fd),
+            OUTPUT_LIMITS_ENV: f"{head},{tail}",
+        }
+        if self.coverage is not None:
+            env["COVERAGE_FILE"] = str(self.coverage.unit_file(name))
+        return env
+
+    def _unit_coverage(
+        self, tests: List[TestInfo], env: Dict[str, str]
+    ) -> Dict[str, float]:
+        """Record the lines covered by the tests of a finished run.
+
+        Args:
+            tests: Tests of the run.
+            env: Environment the run was started with.
+
+        Returns:
+            Dictionary mapping test IDs to coverage percentages.
+        """
+        if self.coverage is None or "COVERAGE_FILE" not in env:
+            return {}
+
+        lookup, classes = self._shard_lookup(tests)
+        try:
+            unit = self.coverage.read_unit(Path(env["COVERAGE_FILE"]))
+        except Exception as e:
+            logger.warning(f"Failed to read coverage data: {e}")
+            return {}
+
+        for node_id, lines in unit.items():
+            test = self._lookup_node(node_id, lookup, classes)
+            if test is None:
+                continue
+            # Parametrized cases add up to the coverage of their test
+            test_lines = self.coverage.tests.setdefault(test.id, {})
+            for filename, file_lines in lines.items():
+                test_lines.setdefault(filename, set()).update(file_lines)
+
+        percentages: Dict[str, float] = {}
+        for test in tests:
+            if test.id in self.coverage.tests:
+                percentage = self.coverage.percentage(self.coverage.tests[test.id])
+                if percentage is not None:
+                    percentages[test.id] = percentage
+        return percentages
+
+    def _parse_error_output(
+        self, output: str
+    ) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """Extract error details from pytest failure output.
+
+        Args:
+            output: Failure output to parse.
+
+        Returns:
+            Tuple of error message, error type and traceback.
+        """
+        error_message: Optional[str] = None
+        error_type: Optional[str] = None
+        error_traceback: Optional[str] = None
+
+        error_lines: List[str] = []
+        in_traceback = False
+
+        for line in output.splitlines():
+            if line.startswith("E   "):
+                if not error_message:
+                    error_message = line[4:]
+                error_lines.append(line[4:])
+            elif "Traceback" in line:
+                in_traceback = True
+            elif in_traceback and line.strip():
+                error_lines.append(line)
+
+        if error_lines:
+            error_traceback = "\n".join(error_lines)
+            # Try to extract error type
+            for line in error_lines:
+                if ": " in line:
+                    error_type = line.split(": ")[0].strip()
+                    break
+
+        return error_message, error_type, error_traceback
+
+    def _bound(self, text: Optional[str]) -> Optional[str]:
+        """Apply the output limits to already captured text.
+
+        Args:
+            text: Captured text.
+
+        Returns:
+            Bounded text.
+        """
+        return bound_text(
+            text, self.config.output_head_kb * 1024, self.config.output_tail_kb * 1024
+        )
+
+    def _spill_name(self, tests: List[TestInfo]) -> str:
+        """Name the spill files of a run.
+
+        Args:
+            tests: Tests of the run.
+
+        Returns:
+            File name stem unique to the set of tests.
+        """
+        ids = "\n".join(test.id for test in tests).encode("utf-8")
+        digest = hashlib.blake2b(ids, digest_size=8).hexdigest()
+        return f"{Path(tests[0].file_path).stem}-{digest}"
+
+    async def _communicate(
+        self,
+        process: asyncio.subprocess.Process,
+        name: str,
+        timeout: float,
+        results: asyncio.StreamReader,
+    ) -> Tuple[BoundedOutput, BoundedOutput, List[Dict[str, Any]]]:
+        """Wait for a process while capturing bounded output and its results.
+
+        A process that does not finish in time is killed; the records it
+        reported so far are kept and followed by a timeout error record.
+
+        Args:
+            process: Process with piped stdout and stderr.
+            name: Name of the spill files, used if spilling is enabled.
+            timeout: Maximum time to wait in seconds.
+            results: Pipe the result plugin of the process reports on.
+
+        Returns:
+            Captured stdout and stderr, and the result records.
+        """
+        head = self.config.output_head_kb * 1024
+        tail = self.config.output_tail_kb * 1024
+        stdout, stderr = (
+            BoundedOutput(
+                head,
+                tail,
+                self.output_dir / f"{name}.{stream}.gz" if self.output_dir else None,
+            )
+            for stream in ("stdout", "stderr")
+        )
+        records: List[Dict[str, Any]] = []
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(
+                    drain(process.stdout, stdout),
+                    drain(process.stderr, stderr),
+                    read_records(results, records),
+                    process.wait(),
+                ),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            records.append(
+                {
+                    "done": True,
+                    "exit_code": None,
+                    "error": "Test execution timed out",
+                    "error_type": "TimeoutError",
+                }
+            )
+        finally:
+            stdout.close()
+            stderr.close()
+        return stdout, stderr, records
 
     async def run_test(self, test: TestInfo) -> TestResult:
         """Run a single test.
@@ -60,190 +340,490 @@ class TestExecutor:
         Raises:
             ExecutionError: If test execution fails.
         """
-        start_time = time.time()
+        results = await self.run_shard([test])
+        return results[test.id]
 
-        try:
-            # Prepare pytest command
-            cmd = [
-                self.config.python_path,
-                "-m",
-                "pytest",
-                str(test.file_path),
-                "-v",
-                "--tb=short",
-                f"--timeout={self.config.timeout}",
-                "--capture=tee-sys",
-            ]
-
-            # Add coverage if enabled
-            if self.config.coverage_target > 0:
-                cmd.extend(
-                    [
-                        "--cov",
-                        "--cov-report=term-missing",
-                    ]
-                )
+    def build_shards(self, tests: List[TestInfo]) -> List[List[TestInfo]]:
+        """Group tests into shards that run in a single pytest process.
+
+        Tests are grouped by file; files with more tests than
+        ``shard_size`` are split into several shards.
+
+        Args:
+            tests: Tests to group.
 
-            # Add test selection
-            if test.class_name:
-                cmd.append(f"{test.class_name}::{test.function_name}")
+        Returns:
+            List of shards, each containing tests from a single file.
+        """
+        by_file: Dict[Path, List[TestInfo]] = {}
+        for test in tests:
+            by_file.setdefault(Path(test.file_path), []).append(test)
+
+        shards: List[List[TestInfo]] = []
+        size = self.config.shard_size
+        for file_tests in by_file.values():
+            if size > 0:
+                for i in range(0, len(file_tests), size):
+                    shards.append(file_tests[i : i + size])
             else:
-                cmd.append(f"{test.function_name}")
+                shards.append(file_tests)
 
-            # Run test in subprocess
-            process = await asyncio.create_subprocess_exec(
-                *cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-            )
+        return shards
 
-            # Wait for completion with timeout
-            try:
-                stdout_bytes, stderr_bytes = await asyncio.wait_for(
-                    process.communicate(), timeout=self.config.timeout
-                )
-            except asyncio.TimeoutError:
-                process.kill()
-                return TestResult(
-                    test_id=test.id,
-                    status="error",
-                    duration=time.time() - start_time,
-                    error_message="Test execution timed out",
-                    error_type="TimeoutError",
-                )
+    def _record_result(self, test: TestInfo, record: Dict[str, Any]) -> TestResult:
+        """Build the result of one pytest item from its plugin record.
 
-            # Parse output
-            stdout = stdout_bytes.decode("utf-8", errors="replace")
-            stderr = stderr_bytes.decode("utf-8", errors="replace")
-
-            # Extract coverage
-            coverage: Optional[float] = None
-            for line in stdout.splitlines():
-                if "TOTAL" in line and "%" in line:
-                    try:
-                        coverage = float(line.split("%")[0].strip().split()[-1])
-                    except (ValueError, IndexError):
-                        pass
-
-            # Determine status
-            if process.returncode == 0:
-                status = "passed"
-            elif process.returncode == 1:
-                status = "failed"
-            elif process.returncode == 5:
-                status = "skipped"
-            else:
-                status = "error"
-
-            # Extract error information
-            error_message: Optional[str] = None
-            error_type: Optional[str] = None
-            error_traceback: Optional[str] = None
-
-            if status in ("failed", "error"):
-                # Parse pytest output for error information
-                error_lines: List[str] = []
-                in_traceback = False
-
-                for line in stderr.splitlines():
-                    if line.startswith("E   "):
-                        if not error_message:
-                            error_message = line[4:]
-                        error_lines.append(line[4:])
-                    elif "Traceback" in line:
-                        in_traceback = True
-                    elif in_traceback and line.strip():
-                        error_lines.append(line)
-
-                if error_lines:
-                    error_traceback = "\n".join(error_lines)
-                    # Try to extract error type
-                    for line in error_lines:
-                        if ": " in line:
-                            error_type = line.split(": ")[0].strip()
-                            break
+        Args:
+            test: Discovered test the item belongs to.
+            record: Record reported by the result plugin.
 
+        Returns:
+            Test execution result.
+        """
+        measurements = {
+            "setup_duration": record.get("setup", 0.0),
+            "call_duration": record.get("call", 0.0),
+            "teardown_duration": record.get("teardown", 0.0),
+            "max_rss": record.get("max_rss"),
+            "warnings": record.get("warnings", []),
+            **{name: record.get(name) for name in USAGE_FIELDS},
+        }
+        if record["outcome"] == "skipped":
             return TestResult(
                 test_id=test.id,
-                status=status,
-                duration=time.time() - start_time,
-                stdout=stdout,
+                status="skipped",
+                duration=record["duration"],
+                stdout=self._bound(record["stdout"]),
+                stderr=self._bound(record["stderr"]),
+                error_message=record["longrepr"] or None,
+                **measurements,
+            )
+
+        return TestResult(
+            test_id=test.id,
+            status=record["outcome"],
+            duration=record["duration"],
+            stdout=self._bound(record["stdout"]),
+            stderr=self._bound(record["stderr"]),
+            error_message=record.get("error_message"),
+            error_type=record.get("error_type"),
+            error_traceback=self._bound(record["longrepr"]) or None,
+            **measurements,
+        )
+
+    def _merge_result(self, results: Dict[str, TestResult], result: TestResult) -> None:
+        """Add a result, merging items (e.g. parametrized cases) of one test.
+
+        Args:
+            results: Results collected so far, updated in place.
+            result: Result of a single pytest item.
+        """
+        previous = results.get(result.test_id)
+        if previous is not None:
+            result.duration += previous.duration
+            result.setup_duration += previous.setup_duration
+            result.call_duration += previous.call_duration
+            result.teardown_duration += previous.teardown_duration
+            for name in USAGE_FIELDS:
+                values = [getattr(r, name) for r in (previous, result)]
+                if any(value is not None for value in values):
+                    setattr(result, name, sum(v for v in values if v is not None))
+            result.warnings = previous.warnings + result.warnings
+            if previous.max_rss is not None:
+                result.max_rss = max(previous.max_rss, result.max_rss or 0)
+            result.stdout = self._bound(
+                "\n".join(part for part in (previous.stdout, result.stdout) if part)
+            )
+            result.stderr = self._bound(
+                "\n".join(part for part in (previous.stderr, result.stderr) if part)
+            )
+            if STATUS_PRIORITY[previous.status] >= STATUS_PRIORITY[result.status]:
+                result.status = previous.status
+                result.error_message = previous.error_message
+                result.error_type = previous.error_type
+                result.error_traceback = previous.error_traceback
+
+        results[result.test_id] = result
+
+    def _shard_lookup(
+        self, tests: List[TestInfo]
+    ) -> Tuple[Dict[Tuple[Optional[str], str], TestInfo], set]:
+        """Index the tests of a shard by class and function name.
+
+        Args:
+            tests: Tests of the shard.
+
+        Returns:
+            Tuple of the lookup table and the set of test class names.
+        """
+        lookup: Dict[Tuple[Optional[str], str], TestInfo] = {
+            (test.class_name, test.function_name): test for test in tests
+        }
+        classes = {test.class_name for test in tests if test.class_name}
+        return lookup, classes
+
+    def _lookup_node(
+        self,
+        node_id: str,
+        lookup: Dict[Tuple[Optional[str], str], TestInfo],
+        classes: set,
+    ) -> Optional[TestInfo]:
+        """Map a pytest node ID of a shard back onto the discovered test.
+
+        Args:
+            node_id: Node ID, possibly of a parametrized case.
+            lookup: Tests of the shard by class and function name.
+            classes: Test class names of the shard.
+
+        Returns:
+            Discovered test, if the node belongs to one.
+        """
+        parts = node_id.split("::")
+        function_name = parts[-1].split("[")[0]
+        class_name: Optional[str] = parts[-2] if len(parts) > 2 else None
+        if class_name not in classes:
+            class_name = None
+        return lookup.get((class_name, function_name))
+
+    def _parse_records(
+        self, tests: List[TestInfo], records: List[Dict[str, Any]]
+    ) -> Tuple[Dict[str, TestResult], Optional[int]]:
+        """Turn the records of the result plugin into per-test results.
+
+        Tests that never ran share the first collection or run error of the
+        shard, such as an import error of their module or a timeout.
+
+        Args:
+            tests: Tests of the shard that produced the records.
+            records: Records in the order they were reported.
+
+        Returns:
+            Tuple of the results by test ID and the pytest exit code if
+            reported.
+        """
+        lookup, classes = self._shard_lookup(tests)
+        results: Dict[str, TestResult] = {}
+        exit_code: Optional[int] = None
+        failure: Optional[Dict[str, Any]] = None
+
+        for record in records:
+            if record.get("done"):
+                exit_code = record.get("exit_code")
+                if record.get("error") and failure is None:
+                    failure = {
+                        "outcome": "error",
+                        "duration": 0.0,
+                        "longrepr": "",
+                        "error_type": record.get("error_type"),
+                        "error_message": record["error"],
+                        "stdout": "",
+                        "stderr": "",
+                    }
+                continue
+            if record.get("collection"):
+                failure = failure or record
+                continue
+
+            # Map the reported item back onto the discovered test
+            test = self._lookup_node(record["nodeid"], lookup, classes)
+            if test is not None:
+                self._merge_result(results, self._record_result(test, record))
+
+        if failure is not None:
+            for test in tests:
+                if test.id not in results:
+                    results[test.id] = self._record_result(test, failure)
+
+        return results, exit_code
+
+    def _unreported_results(
+        self,
+        tests: List[TestInfo],
+        results: Dict[str, TestResult],
+        exit_code: Optional[int],
+        output: str,
+        stderr: str = "",
+    ) -> None:
+        """Fill in results for tests pytest never reported on.
+
+        This covers runs that ended without reporting an error, such as a
+        crashed interpreter or a file without tests.
+
+        Args:
+            tests: Tests of the shard.
+            results: Results collected so far, updated in place.
+            exit_code: Pytest exit code.
+            output: Run output used to extract error details.
+            stderr: Captured standard error of the run.
+        """
+        error_message, error_type, error_traceback = self._parse_error_output(output)
+        for test in tests:
+            if test.id in results:
+                continue
+            results[test.id] = TestResult(
+                test_id=test.id,
+                status="skipped" if exit_code == 5 else "error",
+                duration=0.0,
+                stdout=output,
                 stderr=stderr,
-                coverage=coverage,
                 error_message=error_message,
                 error_type=error_type,
                 error_traceback=error_traceback,
             )
 
+    async def run_shard(self, tests: List[TestInfo]) -> Dict[str, TestResult]:
+        """Run a shard of tests in a single pytest process.
+
+        Per-test results are reported by the result plugin over a pipe.
+
+        Args:
+            tests: Tests to run, all from the same file.
+
+        Returns:
+            Dictionary mapping test IDs to results.
+        """
+        start_time = time.time()
+
+        def shard_error(message: str, error_type: str) -> Dict[str, TestResult]:
+            duration = (time.time() - start_time) / max(len(tests), 1)
+            return {
+                test.id: TestResult(
+                    test_id=test.id,
+                    status="error",
+                    duration=duration,
+                    error_message=message,
+                    error_type=error_type,
+                )
+                for test in tests
+            }
+
+        read_fd, write_fd = os.pipe()
+        pipe = os.fdopen(read_fd, "rb", buffering=0)
+        transport: Optional[asyncio.BaseTransport] = None
+        try:
+            reader = asyncio.StreamReader(limit=STREAM_LIMIT)
+            transport, _ = await asyncio.get_running_loop().connect_read_pipe(
+                lambda: asyncio.StreamReaderProtocol(reader), pipe
+            )
+
+            # Prepare pytest command
+            cmd = self._base_command()
+            cmd.extend(self._node_id(test) for test in tests)
+            name = self._spill_name(tests)
+            env = self._environment(name, write_fd)
+
+            # Run shard in subprocess, keeping only its end of the pipe open
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=env,
+                pass_fds=(write_fd,),
+            )
+            os.close(write_fd)
+            write_fd = -1
+
+            # Wait for completion with a timeout scaled to the shard size
+            stdout_output, stderr_output, records = await self._communicate(
+                process,
+                name,
+                self.config.timeout * len(tests) + STARTUP_ALLOWANCE,
+                reader,
+            )
+
+            results, exit_code = self._parse_records(tests, records)
+
+            # Tests pytest never reported on (e.g. a crashed interpreter)
+            self._unreported_results(
+                tests,
+                results,
+                process.returncode if exit_code is None else exit_code,
+                stdout_output.getvalue(),
+                stderr_output.getvalue(),
+            )
+
+            # The complete output of the shard is shared by its tests
+            coverage = self._unit_coverage(tests, env)
+            for result in results.values():
+                result.stdout_file = stdout_output.spill_file
+                result.stderr_file = stderr_output.spill_file
+                result.coverage = coverage.get(result.test_id)
+
+            return results
+
         except Exception as e:
-            return TestResult(
+            return shard_error(str(e), type(e).__name__)
+
+        finally:
+            if write_fd >= 0:
+                os.close(write_fd)
+            if transport is not None:
+                transport.close()
+            else:
+                pipe.close()
+
+    async def _ensure_pool(self, tests: List[TestInfo]) -> None:
+        """Start the warm worker pool if it is not running yet.
+
+        Args:
+            tests: Tests about to run, used to locate conftest files.
+        """
+        if self.pool is not None:
+            return
+        self.pool = WorkerPool(self.config, self.config.parallel_jobs or None)
+        await self.pool.start(
+            WorkerPool.find_conftests(list({Path(t.file_path) for t in tests}))
+        )
+
+    async def run_shard_pooled(self, tests: List[TestInfo]) -> Dict[str, TestResult]:
+        """Run a shard of tests on a warm pytest worker.
+
+        Args:
+            tests: Tests to run, all from the same file.
+
+        Returns:
+            Dictionary mapping test IDs to results.
+
+        Raises:
+            ExecutionError: If the worker pool has not been started.
+        """
+        if self.pool is None:
+            raise ExecutionError("Worker pool is not running")
+
+        args = [
+            "-p",
+            "no:cacheprovider",
+            "--tb=short",
+            f"--timeout={self.config.timeout}",
+        ]
+        records = await self.pool.run(
+            [self._node_id(test) for test in tests],
+            args,
+            timeout=self.config.timeout * len(tests) + STARTUP_ALLOWANCE,
+        )
+
+        results, exit_code = self._parse_records(tests, records)
+        self._unreported_results(tests, results, exit_code, "")
+        return results
+
+    async def close(self) -> None:
+        """Release execution resources such as the warm worker pool."""
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def _run_single(self, tests: List[TestInfo]) -> Dict[str, TestResult]:
+        """Run a one-test unit in its own pytest process.
+
+        Args:
+            tests: List holding the test to run.
+
+        Returns:
+            Dictionary mapping the test ID to its result.
+        """
+        test = tests[0]
+        try:
+            result = await self.run_test(test)
+        except Exception as e:
+            logger.error(f"Failed to run test {test.id}: {e}")
+            result = TestResult(
                 test_id=test.id,
                 status="error",
-                duration=time.time() - start_time,
+                duration=0.0,
                 error_message=str(e),
                 error_type=type(e).__name__,
             )
+        return {test.id: result}
 
-    async def run_tests(self, tests: List[TestInfo]) -> Dict[str, TestResult]:
-        """Run multiple tests in parallel.
+    async def iter_results(self, tests: List[TestInfo]) -> AsyncIterator[TestResult]:
+        """Run tests in parallel, yielding results as soon as they finish.
+
+        Depending on ``execution_mode`` a unit of work is a single test, a
+        per-file shard or a shard on a warm worker. At most ``parallel_jobs``
+        units run at a time; ``min_free_memory_mb`` additionally holds back
+        new units while memory is low. Units are started longest first,
+        based on the durations recorded by previous runs.
 
         Args:
             tests: Tests to run.
 
-        Returns:
-            Dictionary mapping test IDs to results.
+        Yields:
+            Test results in completion order.
 
         Raises:
             ExecutionError: If test execution fails.
         """
+        if self.coverage is not None:
+            self.coverage.reset()
+            if self.config.execution_mode == "worker":
+                logger.warning("Coverage is not measured on warm workers")
+
+        run_unit: Callable[[List[TestInfo]], Awaitable[Dict[str, TestResult]]]
+        if self.config.execution_mode == "file":
+            units, run_unit = self.build_shards(tests), self.run_shard
+        elif self.config.execution_mode == "worker":
+            await self._ensure_pool(tests)
+            units, run_unit = self.build_shards(tests), self.run_shard_pooled
+        else:
+            units, run_unit = [[test] for test in tests], self._run_single
+
+        measured: List[Tuple[str, float]] = []
         try:
-            # Create tasks for each test
-            tasks: List[Tuple[str, asyncio.Task[TestResult]]] = []
-            for test in tests:
-                task = asyncio.create_task(self.run_test(test))
-                tasks.append((test.id, task))
+            async for _, unit_results in self._scheduler().stream(
+                units,
+                run_unit,
+                cost=lambda unit: sum(self.history.estimate(t) for t in unit),
+            ):
+                for result in unit_results.values():
+                    measured.append((result.test_id, result.duration))
+                    yield result
+
+        except Exception as e:
+            raise ExecutionError(f"Failed to run tests: {str(e)}")
+
+        finally:
+            # Remember durations for scheduling future runs
+            self.history.update(measured)
+            self.history.save()
 
-            # Wait for all tasks to complete
-            results: Dict[str, TestResult] = {}
-            for test_id, task in tasks:
+            # Merge the coverage data of all units once and index it
+            if self.coverage is not None and self.coverage_index is not None:
                 try:
-                    result = await task
-                    results[test_id] = result
-                except Exception as e:
-                    logger.error(f"Failed to run test {test_id}: {e}")
-                    results[test_id] = TestResult(
-                        test_id=test_id,
-                        status="error",
-                        duration=0.0,
-                        error_message=str(e),
-                        error_type=type(e).__name__,
+                    self.coverage.combine()
+                    self.coverage_index.update(
+                        self.coverage.tests, self.coverage.statements
                     )
+                    self.coverage_index.save()
+                except Exception as e:
+                    logger.warning(f"Failed to combine coverage data: {e}")
 
-            return results
+    async def run_tests(self, tests: List[TestInfo]) -> Dict[str, TestResult]:
+        """Run multiple tests in parallel and wait for all results.
 
-        except Exception as e:
-            raise ExecutionError(f"Failed to run tests: {str(e)}")
+        Args:
+            tests: Tests to run.
 
-    def get_coverage_report(self, results: Dict[str, TestResult]) -> Dict[str, float]:
-        """Generate coverage report from test results.
+        Returns:
+            Dictionary mapping test IDs to results, in input order.
 
-        Args:
-            results: Test results.
+        Raises:
+            ExecutionError: If test execution fails.
+        """
+        results = {result.test_id: result async for result in self.iter_results(tests)}
+        return {test.id: results[test.id] for test in tests if test.id in results}
+
+    def get_coverage_report(self) -> Dict[str, float]:
+        """Get the per-file coverage of the last run.
 
         Returns:
             Dictionary mapping files to coverage percentages.
         """
-        coverage: Dict[str, float] = {}
-
-        for result in results.values():
-            if result.coverage is not None and result.stdout:
-                # Parse coverage output to get per-file coverage
-                for line in result.stdout.splitlines():
-                    if ".py" in line and "%" in line:
-                        try:
-                            parts = line.strip().split()
-                            file_path = parts[0]
-                            percentage = float(parts[-1].rstrip("%"))
-                            coverage[file_path] = percentage
-                        except (ValueError, IndexError):
-                            continue
-
-        return coverage
+        return dict(self.coverage.files) if self.coverage else {}
+
+    def get_total_coverage(self) -> Optional[float]:
+        """Get the overall coverage of the last run.
+
+        Returns:
+            Percentage of measured statements covered by any test, if known.
+        """
+        return self.coverage.total if self.coverage else None
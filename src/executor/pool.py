@@ -0,0 +1,261 @@
+"""
+Warm pytest worker pool.
+
+Keeps long-lived interpreters running ``worker.py`` so that batches of tests
+do not pay for interpreter startup, plugin loading and conftest imports.
+"""
+
+import asyncio
+import json
+import os
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from ..core.config import TestConfig
+from ..core.exceptions import ExecutionError
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+
+WORKER_SCRIPT = Path(__file__).with_name("worker.py")
+
+# Maximum size of a single protocol line (captured output can be large)
+STREAM_LIMIT = 16 * 1024 * 1024
+
+# Environment variable passing the output limits to the result plugin (see
+# ``result_plugin.OUTPUT_LIMITS_ENV``)
+OUTPUT_LIMITS_ENV = "TEST_RADAR_OUTPUT_LIMITS"
+
+
+class PytestWorker:
+    """A single persistent pytest interpreter."""
+
+    def __init__(self, config: TestConfig, conftests: List[Path]) -> None:
+        """Initialize worker.
+
+        Args:
+            config: Test configuration.
+            conftests: Conftest files to import during warm-up.
+        """
+        self.config = config
+        self.conftests = conftests
+        self.process: Optional[asyncio.subprocess.Process] = None
+
+    @property
+    def alive(self) -> bool:
+        """Whether the worker process is running."""
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self) -> None:
+        """Start the worker and wait until it is warmed up.
+
+        Raises:
+            ExecutionError: If the worker fails to start.
+        """
+        head = self.config.output_head_kb * 1024
+        tail = self.config.output_tail_kb * 1024
+        self.process = await asyncio.create_subprocess_exec(
+            self.config.python_path,
+            str(WORKER_SCRIPT),
+            *(str(path) for path in self.conftests),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            limit=STREAM_LIMIT,
+            env={**os.environ, OUTPUT_LIMITS_ENV: f"{head},{tail}"},
+        )
+
+        record = await self._read_record()
+        if not record or not record.get("ready"):
+            await self.stop()
+            raise ExecutionError("Pytest worker failed to start")
+
+    async def _read_record(self) -> Optional[Dict[str, Any]]:
+        """Read the next protocol record.
+
+        Returns:
+            Decoded record, or None if the worker exited.
+        """
+        assert self.process is not None and self.process.stdout is not None
+        line = await self.process.stdout.readline()
+        if not line:
+            return None
+        record: Dict[str, Any] = json.loads(line)
+        return record
+
+    async def run(
+        self, node_ids: List[str], args: List[str]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Run a batch of tests, streaming one record per finished test.
+
+        The final record has ``done`` set and carries the pytest exit code.
+
+        Args:
+            node_ids: Pytest node IDs to run.
+            args: Extra pytest arguments.
+
+        Yields:
+            Result records.
+
+        Raises:
+            ExecutionError: If the worker dies during the batch.
+        """
+        if not self.alive:
+            await self.start()
+
+        assert self.process is not None and self.process.stdin is not None
+        request = {"node_ids": node_ids, "args": args}
+        self.process.stdin.write((json.dumps(request) + "\n").encode("utf-8"))
+        await self.process.stdin.drain()
+
+        while True:
+            record = await self._read_record()
+            if record is None:
+                raise ExecutionError("Pytest worker exited unexpectedly")
+            yield record
+            if record.get("done"):
+                return
+
+    async def stop(self, kill: bool = False) -> None:
+        """Stop the worker process.
+
+        Args:
+            kill: Kill the process instead of letting it finish its batch,
+                e.g. when its output can no longer be trusted.
+        """
+        if self.process is None:
+            return
+        if self.process.returncode is None and kill:
+            self.process.kill()
+            await self.process.wait()
+        elif self.process.returncode is None:
+            if self.process.stdin is not None:
+                self.process.stdin.close()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+        self.process = None
+
+
+class WorkerPool:
+    """Pool of warm pytest workers."""
+
+    def __init__(self, config: TestConfig, size: Optional[int] = None) -> None:
+        """Initialize pool.
+
+        Args:
+            config: Test configuration.
+            size: Number of workers, defaults to the CPU count.
+        """
+        self.config = config
+        self.size = size or os.cpu_count() or 1
+        self.workers: List[PytestWorker] = []
+        self.idle: "asyncio.Queue[PytestWorker]" = asyncio.Queue()
+
+    @staticmethod
+    def find_conftests(files: List[Path]) -> List[Path]:
+        """Find conftest files that apply to the given test files.
+
+        Args:
+            files: Test files.
+
+        Returns:
+            Conftest files between the working directory and each test file.
+        """
+        root = Path.cwd().resolve()
+        found: Dict[Path, None] = {}
+        for file_path in files:
+            directory = Path(file_path).resolve().parent
+            while True:
+                conftest = directory / "conftest.py"
+                if conftest.is_file():
+                    found[conftest] = None
+                if directory == root or directory.parent == directory:
+                    break
+                directory = directory.parent
+        return list(found)
+
+    async def start(self, conftests: List[Path]) -> None:
+        """Start and warm up all workers.
+
+        Args:
+            conftests: Conftest files to import during warm-up.
+
+        Raises:
+            ExecutionError: If workers cannot be started.
+        """
+        self.workers = [PytestWorker(self.config, conftests) for _ in range(self.size)]
+        await asyncio.gather(*(worker.start() for worker in self.workers))
+        for worker in self.workers:
+            self.idle.put_nowait(worker)
+        logger.info(f"Started {self.size} pytest workers")
+
+    async def run(
+        self, node_ids: List[str], args: List[str], timeout: float
+    ) -> List[Dict[str, Any]]:
+        """Run a batch of tests on the next idle worker.
+
+        A worker that times out, dies or sends an unreadable record is
+        stopped and restarted lazily for its next batch; the batch then ends
+        with an error record.
+
+        Args:
+            node_ids: Pytest node IDs to run.
+            args: Extra pytest arguments.
+            timeout: Maximum time for the batch in seconds.
+
+        Returns:
+            Result records, the last one having ``done`` set.
+        """
+        worker = await self.idle.get()
+        records: List[Dict[str, Any]] = []
+
+        async def consume() -> None:
+            async for record in worker.run(node_ids, args):
+                records.append(record)
+
+        try:
+            await asyncio.wait_for(consume(), timeout=timeout)
+        except asyncio.TimeoutError:
+            await worker.stop()
+            records.append(
+                {
+                    "done": True,
+                    "exit_code": None,
+                    "error": "Test execution timed out",
+                    "error_type": "TimeoutError",
+                }
+            )
+        except ExecutionError as e:
+            await worker.stop()
+            records.append(
+                {
+                    "done": True,
+                    "exit_code": None,
+                    "error": str(e),
+                    "error_type": type(e).__name__,
+                }
+            )
+        except Exception as e:
+            # Oversized or malformed record, the protocol is out of sync
+            await worker.stop(kill=True)
+            records.append(
+                {
+                    "done": True,
+                    "exit_code": None,
+                    "error": f"Unreadable pytest worker output: {e}",
+                    "error_type": type(e).__name__,
+                }
+            )
+        finally:
+            self.idle.put_nowait(worker)
+
+        return records
+
+    async def close(self) -> None:
+        """Stop all workers."""
+        await asyncio.gather(*(worker.stop() for worker in self.workers))
+        self.workers = []
+        self.idle = asyncio.Queue()
@@ -0,0 +1,336 @@
+"""
+Pytest plugin reporting structured results.
+
+This module runs inside the interpreter configured in ``TestConfig.python_path``
+and therefore only depends on the standard library and pytest. The collector
+sends one JSON record per test with its outcome, phase durations, resource
+usage, error details, recorded warnings and captured output, so the executor
+never parses terminal output.
+
+Run as a script, it executes pytest with the given arguments and writes the
+records to the pipe whose descriptor is in ``TEST_RADAR_RESULT_FD``.
+"""
+
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+import pytest
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None  # type: ignore[assignment]
+
+# Environment variable holding the descriptor records are written to
+RESULT_FD_ENV = "TEST_RADAR_RESULT_FD"
+
+# Environment variable holding the characters of output kept from the start
+# and the end of each text, as ``head,tail``; a head of 0 keeps everything
+OUTPUT_LIMITS_ENV = "TEST_RADAR_OUTPUT_LIMITS"
+
+# Warnings kept per test, the first ones win
+MAX_WARNINGS = 20
+
+# Marker replacing the dropped middle of a text
+ELIDED_MARKER = "\n... [{count} bytes elided] ...\n"
+
+# Unit of ``ru_maxrss`` in bytes: kilobytes on Linux, bytes on macOS
+RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+def output_limits() -> Tuple[int, int]:
+    """Get the output limits passed by the executor.
+
+    Returns:
+        Characters kept from the start and the end of each text.
+    """
+    head, _, tail = os.environ.get(OUTPUT_LIMITS_ENV, "0,0").partition(",")
+    return int(head or 0), int(tail or 0)
+
+
+def usage() -> Optional[Any]:
+    """Get the resource usage of this process.
+
+    Returns:
+        Resource usage, or None where it cannot be measured.
+    """
+    return resource.getrusage(resource.RUSAGE_SELF) if resource else None
+
+
+class ResultCollector:
+    """Pytest plugin collecting per-test outcomes for the parent process."""
+
+    def __init__(self, channel: TextIO, head: int = 0, tail: int = 0) -> None:
+        """Initialize collector.
+
+        Args:
+            channel: Stream records are written to.
+            head: Characters kept from the start of each text, 0 to keep
+                everything.
+            tail: Characters kept from the end of each text.
+        """
+        self.channel = channel
+        self.head = head
+        self.tail = tail
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self.started: Dict[str, Any] = {}
+
+        # Finished test whose warnings may still be recorded
+        self.finished: Optional[Dict[str, Any]] = None
+
+        # Exception type and message of failed collections, by node ID
+        self.collect_errors: Dict[str, Tuple[str, str]] = {}
+
+    def bound(self, text: str) -> str:
+        """Keep the head and tail of a text, like the executor would.
+
+        Args:
+            text: Captured output, report or message.
+
+        Returns:
+            Bounded text.
+        """
+        if self.head <= 0 or len(text) <= self.head + self.tail:
+            return text
+        elided = len(text) - self.head - self.tail
+        tail = text[len(text) - self.tail :] if self.tail > 0 else ""
+        return text[: self.head] + ELIDED_MARKER.format(count=elided) + tail
+
+    def emit(self, record: Dict[str, Any]) -> None:
+        """Send a record to the parent process.
+
+        Texts are bounded first, so captured output of any size never turns
+        into an oversized record.
+
+        Args:
+            record: JSON-serializable record.
+        """
+        for key in ("longrepr", "error_message", "stdout", "stderr"):
+            if record.get(key):
+                record[key] = self.bound(record[key])
+        self.channel.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.channel.flush()
+
+    def flush(self) -> None:
+        """Send the record of the last finished test, if still held back."""
+        if self.finished is not None:
+            record, self.finished = self.finished, None
+            self.emit(record)
+
+    def _record(self, nodeid: str) -> Dict[str, Any]:
+        """Get the record of a test, creating it on its first phase.
+
+        Args:
+            nodeid: Node ID of the test.
+
+        Returns:
+            Record accumulating the phases of the test.
+        """
+        return self.records.setdefault(
+            nodeid,
+            {
+                "nodeid": nodeid,
+                "outcome": "passed",
+                "duration": 0.0,
+                "setup": 0.0,
+                "call": 0.0,
+                "teardown": 0.0,
+                "cpu_user": None,
+                "cpu_system": None,
+                "max_rss": None,
+                "io_read": None,
+                "io_write": None,
+                "warnings": [],
+                "longrepr": "",
+                "error_type": None,
+                "error_message": None,
+                "stdout": "",
+                "stderr": "",
+            },
+        )
+
+    def pytest_runtest_logstart(self, nodeid: str, location: Any) -> None:
+        """Note the resource usage before a test starts.
+
+        Args:
+            nodeid: Node ID of the test.
+            location: Test location (unused).
+        """
+        self.flush()
+        self.started[nodeid] = usage()
+
+    def pytest_runtest_makereport(self, item: Any, call: Any) -> None:
+        """Keep the exception of the first failing phase of a test.
+
+        Args:
+            item: Test item.
+            call: Result of the phase.
+        """
+        excinfo = call.excinfo
+        if excinfo is None or excinfo.errisinstance(pytest.skip.Exception):
+            return
+        record = self._record(item.nodeid)
+        if record["error_type"] is None:
+            if isinstance(excinfo.value, pytest.FixtureLookupError):
+                # The message is only built when the error is rendered
+                message = excinfo.value.formatrepr().errorstring.splitlines()[0]
+            else:
+                message = str(excinfo.value)
+            record["error_type"] = excinfo.typename
+            record["error_message"] = message.strip() or excinfo.typename
+
+    def pytest_runtest_logreport(self, report: Any) -> None:
+        """Accumulate the report of a single test phase.
+
+        Args:
+            report: Pytest test report.
+        """
+        record = self._record(report.nodeid)
+        record["duration"] += report.duration
+        record[report.when] = report.duration
+
+        if report.failed:
+            record["outcome"] = "failed" if report.when == "call" else "error"
+        elif report.skipped and record["outcome"] == "passed":
+            record["outcome"] = "skipped"
+
+        if report.longrepr:
+            if report.skipped and isinstance(report.longrepr, tuple):
+                # Skip reports carry (path, line, reason)
+                record["longrepr"] += str(report.longrepr[2])
+            else:
+                record["longrepr"] += report.longreprtext
+
+        # Captured output accumulates over phases, keep the latest
+        if report.capstdout:
+            record["stdout"] = report.capstdout
+        if report.capstderr:
+            record["stderr"] = report.capstderr
+
+    def pytest_runtest_logfinish(self, nodeid: str, location: Any) -> None:
+        """Stream the record of a finished test.
+
+        Args:
+            nodeid: Node ID of the finished test.
+            location: Test location (unused).
+        """
+        start = self.started.pop(nodeid, None)
+        record = self.records.pop(nodeid, None)
+        if record is None:
+            return
+
+        end = usage()
+        if start is not None and end is not None:
+            # Usage of all phases; the peak RSS is that of the process so far
+            record["cpu_user"] = end.ru_utime - start.ru_utime
+            record["cpu_system"] = end.ru_stime - start.ru_stime
+            record["max_rss"] = end.ru_maxrss * RSS_UNIT
+            record["io_read"] = end.ru_inblock - start.ru_inblock
+            record["io_write"] = end.ru_oublock - start.ru_oublock
+
+        # Warnings of a test are recorded once it has finished
+        self.flush()
+        self.finished = record
+
+    def pytest_warning_recorded(
+        self, warning_message: Any, when: str, nodeid: str, location: Any
+    ) -> None:
+        """Attach a warning to the test that raised it.
+
+        Args:
+            warning_message: Recorded warning.
+            when: Phase the warning was raised in.
+            nodeid: Node ID of the test, empty outside of tests.
+            location: Location of the warning (unused).
+        """
+        if self.finished is not None and self.finished["nodeid"] == nodeid:
+            record = self.finished
+        elif nodeid in self.records:
+            record = self.records[nodeid]
+        else:
+            return
+        if len(record["warnings"]) < MAX_WARNINGS:
+            record["warnings"].append(
+                {
+                    "category": warning_message.category.__name__,
+                    "message": self.bound(str(warning_message.message)),
+                }
+            )
+
+    def pytest_sessionfinish(self, session: Any, exitstatus: Any) -> None:
+        """Send the record held back for the last test.
+
+        Args:
+            session: Pytest session (unused).
+            exitstatus: Exit status (unused).
+        """
+        self.flush()
+
+    def pytest_exception_interact(self, node: Any, call: Any, report: Any) -> None:
+        """Keep the exception of a failed collection for its report.
+
+        Args:
+            node: Collector or test item.
+            call: Failed call.
+            report: Collection or test report.
+        """
+        if not isinstance(report, pytest.CollectReport) or call.excinfo is None:
+            return
+        error = call.excinfo.value
+        if isinstance(error, pytest.Collector.CollectError) and error.__cause__:
+            # Import and syntax errors are wrapped with a formatted message
+            error = error.__cause__
+        name = type(error).__name__
+        self.collect_errors[report.nodeid] = (name, str(error).strip() or name)
+
+    def pytest_collectreport(self, report: Any) -> None:
+        """Report collection errors, which never reach the run phase.
+
+        Args:
+            report: Pytest collection report.
+        """
+        if report.failed:
+            error_type, error_message = self.collect_errors.pop(
+                report.nodeid, (None, None)
+            )
+            self.emit(
+                {
+                    "nodeid": report.nodeid,
+                    "outcome": "error",
+                    "duration": 0.0,
+                    "longrepr": report.longreprtext,
+                    "error_type": error_type,
+                    "error_message": error_message,
+                    "stdout": "",
+                    "stderr": "",
+                    "collection": True,
+                }
+            )
+
+
+def main(argv: List[str]) -> int:
+    """Run pytest, reporting results on the inherited pipe.
+
+    Args:
+        argv: Pytest arguments.
+
+    Returns:
+        Pytest exit code.
+    """
+    # Import tests relative to the working directory, like ``python -m pytest``
+    sys.path[0] = os.getcwd()
+
+    channel = os.fdopen(int(os.environ[RESULT_FD_ENV]), "w")
+    collector = ResultCollector(channel, *output_limits())
+    try:
+        exit_code = int(pytest.main(argv, plugins=[collector]))
+        collector.emit({"done": True, "exit_code": exit_code})
+    finally:
+        channel.close()
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,158 @@
+"""
+Bounded job scheduler.
+
+Runs test jobs with a fixed concurrency limit and optional memory-aware
+admission control, so large suites never start more processes than the
+machine can sustain.
+"""
+
+import asyncio
+import heapq
+import os
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Interval between memory checks while admission is blocked
+MEMORY_POLL_INTERVAL = 0.1
+
+
+def available_memory_mb() -> Optional[float]:
+    """Get the memory available for new processes.
+
+    Returns:
+        Available memory in megabytes, or None if it cannot be determined.
+    """
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        pages = os.sysconf("SC_AVPHYS_PAGES")
+        page_size = os.sysconf("SC_PAGE_SIZE")
+        return pages * page_size / (1024 * 1024)
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+class Scheduler:
+    """Scheduler running jobs with bounded concurrency."""
+
+    def __init__(
+        self, max_jobs: Optional[int] = None, min_free_memory_mb: int = 0
+    ) -> None:
+        """Initialize scheduler.
+
+        Args:
+            max_jobs: Maximum number of concurrent jobs, defaults to the CPU count.
+            min_free_memory_mb: Memory that must remain available before a new
+                job is admitted, 0 to disable memory-aware admission.
+        """
+        self.max_jobs = max_jobs or os.cpu_count() or 1
+        self.min_free_memory_mb = min_free_memory_mb
+        self.running = 0
+
+    async def _admit(self) -> None:
+        """Wait until there is enough free memory to start another job.
+
+        At least one job is always admitted so that the run makes progress.
+        """
+        if self.min_free_memory_mb <= 0:
+            return
+
+        while self.running > 0:
+            available = available_memory_mb()
+            if available is None or available >= self.min_free_memory_mb:
+                return
+            await asyncio.sleep(MEMORY_POLL_INTERVAL)
+
+    def estimate_makespan(self, costs: Sequence[float]) -> float:
+        """Estimate wall time of a longest-job-first run.
+
+        Args:
+            costs: Estimated job durations.
+
+        Returns:
+            Estimated time until the last job finishes.
+        """
+        slots = [0.0] * min(self.max_jobs, max(len(costs), 1))
+        for cost in sorted(costs, reverse=True):
+            heapq.heappush(slots, heapq.heappop(slots) + cost)
+        return max(slots)
+
+    async def stream(
+        self,
+        items: Sequence[T],
+        func: Callable[[T], Awaitable[R]],
+        cost: Optional[Callable[[T], float]] = None,
+    ) -> AsyncIterator[Tuple[int, R]]:
+        """Run a job for each item, yielding results as jobs finish.
+
+        At most ``max_jobs`` jobs run at a time. Without a cost function
+        items are started in the given order. With one, the most expensive
+        items start first and each free slot picks the longest remaining job,
+        which packs jobs evenly across slots.
+
+        Args:
+            items: Items to process.
+            func: Coroutine function processing a single item.
+            cost: Optional function estimating the duration of an item.
+
+        Yields:
+            Pairs of item index and job result, in completion order.
+
+        Raises:
+            Exception: The first exception raised by a job.
+        """
+        order = list(enumerate(items))
+        if cost is not None:
+            costs = {index: cost(item) for index, item in order}
+            order.sort(key=lambda entry: costs[entry[0]], reverse=True)
+            makespan = self.estimate_makespan(list(costs.values()))
+            logger.debug(f"Estimated makespan: {makespan:.2f}s")
+        pending = iter(order)
+        finished: "asyncio.Queue[Tuple[int, Any, Optional[BaseException]]]" = (
+            asyncio.Queue()
+        )
+
+        async def worker() -> None:
+            for index, item in pending:
+                await self._admit()
+                self.running += 1
+                try:
+                    finished.put_nowait((index, await func(item), None))
+                except Exception as e:
+                    finished.put_nowait((index, None, e))
+                finally:
+                    self.running -= 1
+
+        workers = [
+            asyncio.create_task(worker()) for _ in range(min(self.max_jobs, len(items)))
+        ]
+        try:
+            for _ in range(len(items)):
+                index, result, error = await finished.get()
+                if error is not None:
+                    raise error
+                yield index, result
+        finally:
+            for task in workers:
+                task.cancel()
@@ -0,0 +1,118 @@
+"""
+Historical test durations.
+
+Persists per-test durations between runs so the scheduler can start the
+longest tests first.
+"""
+
+import json
+import statistics
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..core.logger import get_logger
+from ..scanner.scanner import TestInfo
+
+logger = get_logger(__name__)
+
+# Cost assumed for tests when no history is available at all
+DEFAULT_DURATION = 1.0
+
+# Weight of the latest measurement in the moving average
+SMOOTHING = 0.5
+
+
+class DurationHistory:
+    """Store of smoothed per-test durations."""
+
+    def __init__(self, cache_dir: Optional[Path] = None) -> None:
+        """Initialize history, loading previous timings if available.
+
+        Args:
+            cache_dir: Directory the history is persisted in, None to keep it
+                in memory only.
+        """
+        self.path = Path(cache_dir) / "durations.json" if cache_dir else None
+        self.durations: Dict[str, float] = {}
+        self._file_means: Optional[Dict[str, float]] = None
+        self._median: Optional[float] = None
+        self.load()
+
+    def load(self) -> None:
+        """Load timings from disk, ignoring missing or corrupt files."""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.durations = {k: float(v) for k, v in json.load(f).items()}
+        except Exception as e:
+            logger.warning(f"Failed to load duration history {self.path}: {e}")
+            self.durations = {}
+        self._invalidate()
+
+    def save(self) -> None:
+        """Persist timings to disk."""
+        if not self.path:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self.durations, f)
+        except Exception as e:
+            logger.warning(f"Failed to save duration history {self.path}: {e}")
+
+    def _invalidate(self) -> None:
+        """Drop derived statistics after the timings changed."""
+        self._file_means = None
+        self._median = None
+
+    def update(self, durations: Iterable[Tuple[str, float]]) -> None:
+        """Record measured durations.
+
+        Args:
+            durations: Pairs of test ID and duration in seconds.
+        """
+        for test_id, duration in durations:
+            if duration <= 0:
+                continue
+            previous = self.durations.get(test_id)
+            if previous is None:
+                self.durations[test_id] = duration
+            else:
+                self.durations[test_id] = (
+                    SMOOTHING * duration + (1 - SMOOTHING) * previous
+                )
+        self._invalidate()
+
+    def estimate(self, test: TestInfo) -> float:
+        """Estimate the duration of a test.
+
+        Known tests use their recorded duration. New tests are estimated from
+        the mean of known tests in the same file, then from the median of all
+        known tests.
+
+        Args:
+            test: Test to estimate.
+
+        Returns:
+            Estimated duration in seconds.
+        """
+        known = self.durations.get(test.id)
+        if known is not None:
+            return known
+
+        if self._file_means is None:
+            sums: Dict[str, List[float]] = {}
+            for test_id, duration in self.durations.items():
+                sums.setdefault(test_id.split("::")[0], []).append(duration)
+            self._file_means = {k: statistics.fmean(v) for k, v in sums.items()}
+            self._median = (
+                statistics.median(self.durations.values())
+                if self.durations
+                else DEFAULT_DURATION
+            )
+
+        file_key = test.id.split("::")[0]
+        if file_key in self._file_means:
+            return self._file_means[file_key]
+        return self._median or DEFAULT_DURATION
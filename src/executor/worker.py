@@ -0,0 +1,64 @@
+"""
+Persistent pytest worker process.
+
+This script runs inside the interpreter configured in ``TestConfig.python_path``
+and therefore only depends on the standard library and pytest. It imports
+pytest and the project's conftest modules once, then executes batches of node
+IDs received as JSON lines on stdin, streaming one JSON record per test back
+on the original stdout through the collector of ``result_plugin.py``.
+"""
+
+import json
+import os
+import sys
+from typing import List
+
+import pytest
+
+# Imported from the script's own directory, which is not a package
+from result_plugin import (  # type: ignore[import-not-found]
+    ResultCollector,
+    output_limits,
+)
+
+
+def main(argv: List[str]) -> int:
+    """Serve test batches until stdin is closed.
+
+    Args:
+        argv: Conftest files to import during warm-up.
+
+    Returns:
+        Process exit code.
+    """
+    # Import tests relative to the working directory, like ``python -m pytest``,
+    # rather than from this script's directory
+    sys.path[0] = os.getcwd()
+
+    # Keep the real stdout for the protocol and silence pytest's terminal output
+    channel = os.fdopen(os.dup(1), "w")
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+
+    collector = ResultCollector(channel, *output_limits())
+
+    # Warm up: collecting the conftest files imports them and their fixtures
+    if argv:
+        pytest.main(["--collect-only", "-q", "-p", "no:cacheprovider", *argv])
+
+    collector.emit({"ready": True, "pid": os.getpid()})
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        exit_code = pytest.main(
+            [*request.get("args", []), *request["node_ids"]], plugins=[collector]
+        )
+        collector.emit({"done": True, "exit_code": int(exit_code)})
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -6,7 +6,7 @@ Integrates all components and provides CLI interface.
 import asyncio
 import sys
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 import click
 from rich.console import Console
@@ -14,7 +14,9 @@ from rich.console import Console
 from .core.config import RadarConfig, load_config
 from .core.exceptions import RadarError
 from .core.logger import setup_logger
+from .scanner.changes import changed_files
 from .scanner.scanner import TestScanner
+from .executor.coverage_index import CoverageIndex
 from .executor.executor import TestExecutor
 from .reporter.reporter import TestReporter
 from .analyzer.llm_analyzer import LLMAnalyzer
@@ -22,6 +24,10 @@ from .analyzer.llm_analyzer import LLMAnalyzer
 console = Console()
 logger = setup_logger()
 
+def show_issue(test_id: str, issue: str) -> None:
+    """Print an issue reported while an analysis is streaming"""
+    console.print(f"[cyan]{test_id}[/cyan] [red]•[/red] {issue}")
+
 @click.group()
 @click.option(
     '--config',
@@ -51,7 +57,7 @@ def cli(ctx, config: Optional[str]):
 def scan(ctx, paths: List[str], pattern: str):
     """Scan for tests in specified paths"""
     config = ctx.obj['config']
-    scanner = TestScanner(config.test)
+    scanner = TestScanner(config.test, Path(config.cache_dir))
     
     try:
         for path in paths:
@@ -73,6 +79,52 @@ def scan(ctx, paths: List[str], pattern: str):
         logger.error(f"Scan failed: {e}")
         sys.exit(1)
 
+def parse_target(target: str) -> Tuple[str, Optional[int]]:
+    """Split an impact target into its file and optional line (FILE[:LINE])"""
+    file_path, separator, line = target.rpartition(':')
+    if not separator:
+        return target, None
+    if line.isdigit():
+        return file_path, int(line)
+    # A Windows drive letter is not followed by a line
+    if len(file_path) == 1 and file_path.isalpha():
+        return target, None
+    raise click.BadParameter(f"{line!r} is not a line number", param_hint='TARGET')
+
+@cli.command()
+@click.argument('target', required=False)
+@click.option(
+    '--test',
+    '-t',
+    'test_id',
+    default=None,
+    help='Show the lines covered by a test instead'
+)
+@click.pass_context
+def impact(
+    ctx: click.Context, target: Optional[str], test_id: Optional[str]
+) -> None:
+    """Show the tests covering a file or line (FILE[:LINE])"""
+    config = ctx.obj['config']
+    index = CoverageIndex(Path(config.cache_dir))
+    
+    if test_id:
+        for file_path, lines in sorted(index.coverage_of(test_id).items()):
+            console.print(f"  • {file_path}: {len(lines)} lines")
+        return
+    
+    if not target:
+        raise click.UsageError("Give a FILE[:LINE] target or --test")
+    file_path, line = parse_target(target)
+    tests = index.tests_covering(file_path, line)
+    console.print(f"\n{len(tests)} tests cover {target}:")
+    for test in tests:
+        console.print(f"  • {test}")
+    
+    missing = sorted(index.missing_lines(file_path))
+    if line is None and missing:
+        console.print(f"\n[yellow]Uncovered lines:[/yellow] {missing}")
+
 @cli.command()
 @click.argument('paths', nargs=-1, type=click.Path(exists=True))
 @click.option(
@@ -85,6 +137,18 @@ def scan(ctx, paths: List[str], pattern: str):
     default=True,
     help='Collect coverage data'
 )
+@click.option(
+    '--mode',
+    type=click.Choice(['test', 'file', 'worker']),
+    default=None,
+    help='Run one pytest process per test, per file, or on warm workers'
+)
+@click.option(
+    '--affected-since',
+    metavar='REV',
+    default=None,
+    help='Only run tests affected by changes since a git revision'
+)
 @click.option(
     '--report',
     '-r',
@@ -97,16 +161,20 @@ async def run(
     paths: List[str],
     parallel: bool,
     coverage: bool,
+    mode: Optional[str],
+    affected_since: Optional[str],
     report: Optional[str]
 ):
     """Run tests and analyze results"""
     config = ctx.obj['config']
     
     # Initialize components
-    scanner = TestScanner(config.test)
-    executor = TestExecutor(config.test)
+    scanner = TestScanner(config.test, Path(config.cache_dir))
+    executor = TestExecutor(config.test, Path(config.cache_dir))
     reporter = TestReporter(config.test)
-    analyzer = LLMAnalyzer(config.llm)
+    analyzer = LLMAnalyzer(config.llm, Path(config.cache_dir))
+    if config.llm.stream:
+        analyzer.on_issue = show_issue
     
     try:
         # Scan for tests
@@ -123,15 +191,49 @@ async def run(
             logger.error("No tests found")
             sys.exit(1)
         
+        # Keep only tests affected by changes since the given revision
+        if affected_since:
+            changed = changed_files(affected_since)
+            affected = scanner.select_affected(all_tests, changed)
+            console.print(
+                f"\n{len(changed)} files changed since {affected_since}, "
+                f"{len(affected)} of {len(all_tests)} tests affected"
+            )
+            if not affected:
+                sys.exit(0)
+            all_tests = affected
+        
         console.print(f"\nRunning {len(all_tests)} tests...")
         
         # Run tests
         if not parallel:
             config.test.parallel_jobs = 1
-        results = await executor.run_tests(all_tests)
+        if mode:
+            config.test.execution_mode = mode
+        # Run tests, analyzing failures while the remaining tests still run
+        tests_by_id = {test.id: test for test in all_tests}
+        streamed = {}
+        early_analyses = {}
+        # Batched analysis waits for whole files instead
+        analyze_early = config.llm.analysis_mode == "test"
+        try:
+            async for result in reporter.track(
+                executor.iter_results(all_tests), len(all_tests)
+            ):
+                streamed[result.test_id] = result
+                test = tests_by_id.get(result.test_id)
+                if analyze_early and test and analyzer.triage.selects(result):
+                    early_analyses[test.id] = asyncio.create_task(
+                        analyzer.analyze_result(test, result)
+                    )
+        finally:
+            await executor.close()
+        results = {t.id: streamed[t.id] for t in all_tests if t.id in streamed}
         
         # Generate report
-        test_report = reporter.generate_report(all_tests, results)
+        test_report = reporter.generate_report(
+            all_tests, results, coverage=executor.get_total_coverage()
+        )
         reporter.print_report(test_report)
         
         if report:
@@ -140,7 +242,17 @@ async def run(
         
         # Analyze results
         console.print("\nAnalyzing test results...")
-        analyses = await analyzer.analyze_results(all_tests, results)
+        analyses = await analyzer.analyze_results(
+            [t for t in all_tests if t.id not in early_analyses], results
+        )
+        for test_id, task in early_analyses.items():
+            analysis = await task
+            if analysis is not None:
+                analyses[test_id] = analysis
+        console.print(
+            f"LLM usage: ~{analyzer.budget.tokens} tokens "
+            f"(${analyzer.budget.cost:.2f})"
+        )
         
         # Print analysis summary
         console.print("\nAnalysis Summary:")
@@ -182,8 +294,10 @@ async def run(
 async def analyze(ctx, paths: List[str], fix: bool):
     """Analyze tests without running them"""
     config = ctx.obj['config']
-    scanner = TestScanner(config.test)
-    analyzer = LLMAnalyzer(config.llm)
+    scanner = TestScanner(config.test, Path(config.cache_dir))
+    analyzer = LLMAnalyzer(config.llm, Path(config.cache_dir))
+    if config.llm.stream:
+        analyzer.on_issue = show_issue
     
     try:
         # Scan for tests
@@ -213,7 +327,7 @@ async def analyze(ctx, paths: List[str], fix: bool):
         }
         
         # Analyze tests
-        analyses = await analyzer.analyze_results(all_tests, results)
+        analyses = await analyzer.analyze_results(all_tests, results, select=False)
         
         # Print analysis
         for test_id, analysis in analyses.items():
@@ -7,9 +7,10 @@ import json
 from dataclasses import asdict, dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional
 
 from rich.console import Console
+from rich.progress import BarColumn, MofNCompleteColumn, Progress, TextColumn
 from rich.table import Table
 
 from ..analyzer.llm_analyzer import TestAnalysis
@@ -21,6 +22,9 @@ from ..scanner.scanner import TestInfo
 
 logger = get_logger(__name__)
 
+# Number of slowest tests broken down in the hot spot tables
+HOT_SPOTS = 10
+
 
 @dataclass
 class TestReport:
@@ -39,6 +43,40 @@ class TestReport:
     analyses: Dict[str, TestAnalysis] = None
 
 
+def hot_spot_row(result: TestResult) -> List[str]:
+    """Format the timing and resource usage of a test
+
+    Args:
+        result: Test result
+
+    Returns:
+        Setup, call and teardown durations, CPU time, peak RSS and I/O
+    """
+    cpu = (
+        f"{result.cpu_user:.2f}s / {result.cpu_system:.2f}s"
+        if result.cpu_user is not None and result.cpu_system is not None
+        else "N/A"
+    )
+    rss = (
+        f"{result.max_rss / (1024 * 1024):.1f} MiB"
+        if result.max_rss is not None
+        else "N/A"
+    )
+    io = (
+        f"{result.io_read} / {result.io_write}"
+        if result.io_read is not None and result.io_write is not None
+        else "N/A"
+    )
+    return [
+        f"{result.setup_duration:.2f}s",
+        f"{result.call_duration:.2f}s",
+        f"{result.teardown_duration:.2f}s",
+        cpu,
+        rss,
+        io,
+    ]
+
+
 class TestReporter:
     """Reporter for generating test reports"""
 
@@ -51,11 +89,61 @@ class TestReporter:
         self.config = config
         self.console = Console()
 
+    def hot_spots(self, results: Dict[str, TestResult]) -> List[TestResult]:
+        """Find the slowest tests that ran
+
+        Args:
+            results: Test execution results
+
+        Returns:
+            Up to ``HOT_SPOTS`` results, slowest first
+        """
+        measured = [r for r in results.values() if r.duration > 0]
+        return sorted(measured, key=lambda r: r.duration, reverse=True)[:HOT_SPOTS]
+
+    async def track(
+        self, results: AsyncIterator[TestResult], total: int
+    ) -> AsyncIterator[TestResult]:
+        """Show live progress while test results stream in
+
+        Args:
+            results: Test results in completion order
+            total: Number of tests expected
+
+        Yields:
+            The test results, unchanged
+        """
+        counts = {"passed": 0, "failed": 0, "error": 0, "skipped": 0}
+
+        def summary() -> str:
+            return (
+                f"[green]{counts['passed']} passed[/green] "
+                f"[red]{counts['failed']} failed[/red] "
+                f"[yellow]{counts['error']} errors[/yellow] "
+                f"[blue]{counts['skipped']} skipped[/blue]"
+            )
+
+        with Progress(
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            MofNCompleteColumn(),
+            TextColumn("{task.fields[summary]}"),
+            console=self.console,
+            transient=True,
+        ) as progress:
+            task = progress.add_task("Running tests", total=total, summary=summary())
+            async for result in results:
+                if result.status in counts:
+                    counts[result.status] += 1
+                progress.update(task, advance=1, summary=summary())
+                yield result
+
     def generate_report(
         self,
         tests: List[TestInfo],
         results: Dict[str, TestResult],
         analyses: Optional[Dict[str, TestAnalysis]] = None,
+        coverage: Optional[float] = None,
     ) -> TestReport:
         """Generate complete test report
 
@@ -63,6 +151,8 @@ class TestReporter:
             tests: List of tests
             results: Test execution results
             analyses: Optional test analyses
+            coverage: Optional overall coverage, defaults to the mean of the
+                per-test coverage
 
         Returns:
             Complete test report
@@ -79,11 +169,10 @@ class TestReporter:
         average_duration = total_duration / total_tests if total_tests > 0 else 0
 
         # Calculate overall coverage
-        coverage = None
         coverage_values = [
             r.coverage for r in results.values() if r.coverage is not None
         ]
-        if coverage_values:
+        if coverage is None and coverage_values:
             coverage = sum(coverage_values) / len(coverage_values)
 
         return TestReport(
@@ -151,6 +240,25 @@ class TestReporter:
 
         self.console.print(results_table)
 
+        # Print where the time of the slowest tests goes
+        hot_spots = self.hot_spots(report.test_results)
+        if hot_spots:
+            self.console.print("\n[bold cyan]Hot Spots[/bold cyan]")
+
+            hot_spots_table = Table(show_header=True)
+            hot_spots_table.add_column("Test ID", style="cyan")
+            hot_spots_table.add_column("Setup", style="blue")
+            hot_spots_table.add_column("Call", style="blue")
+            hot_spots_table.add_column("Teardown", style="blue")
+            hot_spots_table.add_column("CPU (user / sys)", style="magenta")
+            hot_spots_table.add_column("Peak RSS", style="magenta")
+            hot_spots_table.add_column("I/O (in / out)", style="magenta")
+
+            for result in hot_spots:
+                hot_spots_table.add_row(result.test_id, *hot_spot_row(result))
+
+            self.console.print(hot_spots_table)
+
         # Print analyses if available
         if report.analyses:
             self.console.print("\n[bold cyan]Test Analyses[/bold cyan]")
@@ -217,7 +325,9 @@ class TestReporter:
 
             # Save as HTML
             elif output_path.suffix == ".html":
-                html = self._generate_html_report(report_dict)
+                html = self._generate_html_report(
+                    report_dict, self.hot_spots(report.test_results)
+                )
                 with open(output_path, "w") as f:
                     f.write(html)
 
@@ -229,11 +339,14 @@ class TestReporter:
         except Exception as e:
             raise ReportError(f"Failed to save report: {str(e)}")
 
-    def _generate_html_report(self, report_dict: dict) -> str:
+    def _generate_html_report(
+        self, report_dict: dict, hot_spots: List[TestResult]
+    ) -> str:
         """Generate HTML report
 
         Args:
             report_dict: Report data
+            hot_spots: Slowest tests, broken down by phase and resource
 
         Returns:
             HTML report content
@@ -255,6 +368,19 @@ class TestReporter:
             """
             )
 
+        # Generate hot spot table rows
+        hot_spot_rows = []
+        for result in hot_spots:
+            cells = "".join(f"<td>{cell}</td>" for cell in hot_spot_row(result))
+            hot_spot_rows.append(
+                f"""
+            <tr>
+                <td>{result.test_id}</td>
+                {cells}
+            </tr>
+            """
+            )
+
         # Generate analysis sections
         analysis_sections = []
         for test_id, analysis in report_dict.get("analyses", {}).items():
@@ -337,6 +463,22 @@ class TestReporter:
                 </table>
             </div>
 
+            <div class="results">
+                <h2>Hot Spots</h2>
+                <table>
+                    <tr>
+                        <th>Test ID</th>
+                        <th>Setup</th>
+                        <th>Call</th>
+                        <th>Teardown</th>
+                        <th>CPU (user / sys)</th>
+                        <th>Peak RSS</th>
+                        <th>I/O (in / out)</th>
+                    </tr>
+                    {''.join(hot_spot_rows)}
+                </table>
+            </div>
+
             {''.join(analysis_sections)}
         </body>
         </html>
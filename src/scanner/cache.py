@@ -0,0 +1,174 @@
+"""
+Persistent scan index.
+
+Stores the tests discovered in each file together with the file's mtime,
+size and content hash, so unchanged files are not re-read or re-parsed.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Bump when the layout of cached entries changes
+INDEX_VERSION = 4
+
+
+def content_hash(data: Union[bytes, mmap.mmap]) -> str:
+    """Hash file content.
+
+    Args:
+        data: Raw file content.
+
+    Returns:
+        Hex digest of the content.
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class ScanCache:
+    """Index of scanned files keyed by path."""
+
+    def __init__(self, cache_dir: Optional[Path] = None) -> None:
+        """Initialize cache, loading the index from disk if available.
+
+        Args:
+            cache_dir: Directory the index is persisted in, None to keep it
+                in memory only.
+        """
+        self.path = Path(cache_dir) / "scan_index.json" if cache_dir else None
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.dirty = False
+        self.load()
+
+    def load(self) -> None:
+        """Load the index, discarding missing, corrupt or outdated files."""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                self.entries = data.get("files", {})
+        except Exception as e:
+            logger.warning(f"Failed to load scan index {self.path}: {e}")
+            self.entries = {}
+
+    def save(self) -> None:
+        """Persist the index if it changed."""
+        if not self.path or not self.dirty:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "files": self.entries}, f)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except Exception as e:
+            logger.warning(f"Failed to save scan index {self.path}: {e}")
+
+    def get(self, file_path: Path) -> Optional[Dict[str, Any]]:
+        """Get the cached entry of a file without validating it.
+
+        Args:
+            file_path: Path of the file.
+
+        Returns:
+            Cached entry, if any.
+        """
+        return self.entries.get(str(file_path))
+
+    def lookup(self, file_path: Path, stat: os.stat_result) -> Optional[Dict[str, Any]]:
+        """Get the cached entry of a file if its metadata is unchanged.
+
+        Args:
+            file_path: Path of the file.
+            stat: Current stat result of the file.
+
+        Returns:
+            Cached entry, or None if the file must be checked by content.
+        """
+        entry = self.entries.get(str(file_path))
+        if (
+            entry is not None
+            and entry["mtime_ns"] == stat.st_mtime_ns
+            and entry["size"] == stat.st_size
+        ):
+            return entry
+        return None
+
+    def lookup_content(
+        self, file_path: Path, stat: os.stat_result, digest: str
+    ) -> Optional[Dict[str, Any]]:
+        """Get the cached entry of a touched file whose content is unchanged.
+
+        The entry's metadata is refreshed so the next lookup is stat-only.
+
+        Args:
+            file_path: Path of the file.
+            stat: Current stat result of the file.
+            digest: Content hash of the file.
+
+        Returns:
+            Cached entry, or None if the content changed.
+        """
+        entry = self.entries.get(str(file_path))
+        if entry is None or entry["hash"] != digest:
+            return None
+        entry["mtime_ns"] = stat.st_mtime_ns
+        entry["size"] = stat.st_size
+        self.dirty = True
+        return entry
+
+    def store(
+        self,
+        file_path: Path,
+        stat: os.stat_result,
+        digest: str,
+        tests: List[Dict[str, Any]],
+        imports: List[List[Any]],
+    ) -> None:
+        """Store the scan result of a file.
+
+        Args:
+            file_path: Path of the file.
+            stat: Stat result of the scanned file.
+            digest: Content hash of the scanned file.
+            tests: Serialized tests found in the file.
+            imports: Import records of the file.
+        """
+        self.entries[str(file_path)] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "hash": digest,
+            "tests": tests,
+            "imports": imports,
+        }
+        self.dirty = True
+
+    def prune(self, directory: Path, seen: List[str]) -> None:
+        """Drop entries of files below a directory that no longer exist.
+
+        Args:
+            directory: Directory that was scanned.
+            seen: Paths of files found during the scan.
+        """
+        seen_set = set(seen)
+        stale = [
+            key
+            for key in self.entries
+            if key not in seen_set
+            and (directory == Path(".") or Path(key).is_relative_to(directory))
+            and not Path(key).exists()
+        ]
+        for key in stale:
+            del self.entries[key]
+        if stale:
+            self.dirty = True
@@ -0,0 +1,64 @@
+"""
+Changed file detection.
+
+Lists the files changed in the local git repository since a revision, for
+selecting only the tests affected by a change.
+"""
+
+import subprocess
+from pathlib import Path
+from typing import List, Optional
+
+from ..core.exceptions import ScanError
+
+
+def _git(args: List[str], cwd: Optional[Path] = None) -> List[str]:
+    """Run a git command and return its output lines.
+
+    Args:
+        args: Git arguments.
+        cwd: Optional working directory.
+
+    Returns:
+        Non-empty output lines.
+
+    Raises:
+        ScanError: If git fails.
+    """
+    try:
+        output = subprocess.run(
+            ["git", *args],
+            cwd=cwd,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError) as e:
+        stderr = getattr(e, "stderr", None) or str(e)
+        raise ScanError(f"git {' '.join(args)} failed: {stderr.strip()}")
+    return [line for line in output.splitlines() if line.strip()]
+
+
+def changed_files(since: str, cwd: Optional[Path] = None) -> List[Path]:
+    """Get the files changed since a git revision.
+
+    Includes committed, staged and unstaged changes as well as untracked
+    files; a renamed file is reported under its old and new path. Paths are
+    absolute.
+
+    Args:
+        since: Git revision to compare against.
+        cwd: Optional directory inside the repository.
+
+    Returns:
+        Changed file paths.
+
+    Raises:
+        ScanError: If the repository or revision cannot be read.
+    """
+    top_level = Path(_git(["rev-parse", "--show-toplevel"], cwd)[0])
+    # Renamed files are listed under both paths so that dependents of the
+    # old module are selected
+    names = _git(["diff", "--name-only", "--no-renames", since, "--"], cwd)
+    names += _git(["ls-files", "--others", "--exclude-standard", "--full-name"], cwd)
+    return [top_level / name for name in dict.fromkeys(names)]
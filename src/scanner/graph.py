@@ -0,0 +1,382 @@
+"""
+Project-wide import graph.
+
+Resolves absolute, relative and package imports between project files,
+keeps the parsed imports of every file in an incremental on-disk index and
+precomputes, for each test file, the set of files it can reach together
+with the reverse index of test files reaching each file. A test file also
+reaches the ``conftest.py`` files above it, as pytest loads them first.
+"""
+
+import ast
+import json
+import os
+import re
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from ..core.config import TestConfig
+from ..core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Bump when the layout of the persisted graph changes
+GRAPH_VERSION = 2
+
+# Directories never considered part of the project sources
+SKIPPED_DIRS = {
+    "__pycache__",
+    "build",
+    "dist",
+    "node_modules",
+    "site-packages",
+    "venv",
+}
+
+# An import record: [module, level, imported names]
+ImportRecord = List[Any]
+
+
+def import_records(node: ast.AST) -> List[ImportRecord]:
+    """Build import records for an import statement.
+
+    Args:
+        node: AST node, records are only produced for import statements.
+
+    Returns:
+        One record per imported module.
+    """
+    if isinstance(node, ast.Import):
+        return [[alias.name, 0, []] for alias in node.names]
+    if isinstance(node, ast.ImportFrom):
+        names = [alias.name for alias in node.names]
+        return [[node.module or "", node.level, names]]
+    return []
+
+
+def parse_imports(data: bytes, file_path: Path) -> List[ImportRecord]:
+    """Extract the import records of a Python source file.
+
+    Args:
+        data: Raw file content.
+        file_path: Path of the file.
+
+    Returns:
+        Import records in source order.
+    """
+    if b"import" not in data:
+        return []
+    tree = ast.parse(data.decode("utf-8"), filename=str(file_path))
+    records: List[ImportRecord] = []
+    for node in ast.walk(tree):
+        records.extend(import_records(node))
+    return records
+
+
+def file_key(path: Path) -> str:
+    """Normalize a path into an index key relative to the working directory.
+
+    Args:
+        path: File path.
+
+    Returns:
+        Normalized relative path.
+    """
+    return os.path.relpath(os.path.abspath(path))
+
+
+class ImportGraph:
+    """Import graph of the project with precomputed reachability."""
+
+    def __init__(self, config: TestConfig, cache_dir: Optional[Path] = None) -> None:
+        """Initialize graph, loading the persisted index if available.
+
+        Args:
+            config: Test configuration.
+            cache_dir: Directory the graph is persisted in, None to keep it
+                in memory only.
+        """
+        self.config = config
+        self.path = Path(cache_dir) / "import_graph.json" if cache_dir else None
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.reach: Dict[str, List[str]] = {}
+        self.reverse: Dict[str, List[str]] = {}
+        self.dirty = False
+        self.load()
+
+    def load(self) -> None:
+        """Load the graph, discarding missing, corrupt or outdated files."""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == GRAPH_VERSION:
+                self.files = data.get("files", {})
+                self.reach = data.get("reach", {})
+                self.reverse = data.get("reverse", {})
+        except Exception as e:
+            logger.warning(f"Failed to load import graph {self.path}: {e}")
+            self.files, self.reach, self.reverse = {}, {}, {}
+
+    def save(self) -> None:
+        """Persist the graph if it changed."""
+        if not self.path or not self.dirty:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "version": GRAPH_VERSION,
+                        "files": self.files,
+                        "reach": self.reach,
+                        "reverse": self.reverse,
+                    },
+                    f,
+                )
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except Exception as e:
+            logger.warning(f"Failed to save import graph {self.path}: {e}")
+
+    def _source_files(self) -> Dict[str, str]:
+        """Map module names to project files.
+
+        Returns:
+            Dictionary mapping dotted module names to file keys.
+        """
+        exclude_patterns = [re.compile(p) for p in self.config.exclude_patterns]
+        modules: Dict[str, str] = {}
+
+        for root in self.config.source_roots:
+            root_path = Path(root)
+            for dirpath, dirnames, filenames in os.walk(root_path):
+                dirnames[:] = [
+                    d
+                    for d in dirnames
+                    if not d.startswith(".")
+                    and d not in SKIPPED_DIRS
+                    and not any(
+                        p.match(os.path.join(dirpath, d)) for p in exclude_patterns
+                    )
+                ]
+                rel_dir = Path(dirpath).relative_to(root_path)
+                for filename in filenames:
+                    if not filename.endswith(".py"):
+                        continue
+                    parts = list(rel_dir.parts)
+                    if filename != "__init__.py":
+                        parts.append(filename[:-3])
+                    if not parts:
+                        continue
+                    modules.setdefault(
+                        ".".join(parts), file_key(Path(dirpath) / filename)
+                    )
+
+        return modules
+
+    def _refresh(
+        self, file_keys: Iterable[str], known_imports: Dict[str, List[ImportRecord]]
+    ) -> bool:
+        """Re-parse files that changed since they were indexed.
+
+        Args:
+            file_keys: Keys of all project files.
+            known_imports: Imports already parsed elsewhere, by file key.
+
+        Returns:
+            Whether any entry changed.
+        """
+        changed = False
+        current: Set[str] = set()
+
+        for key in file_keys:
+            current.add(key)
+            try:
+                stat = os.stat(key)
+            except OSError:
+                continue
+            entry = self.files.get(key)
+            if (
+                entry is not None
+                and entry["mtime_ns"] == stat.st_mtime_ns
+                and entry["size"] == stat.st_size
+            ):
+                continue
+
+            imports = known_imports.get(key)
+            if imports is None:
+                try:
+                    with open(key, "rb") as f:
+                        imports = parse_imports(f.read(), Path(key))
+                except Exception as e:
+                    logger.warning(f"Failed to parse imports of {key}: {e}")
+                    imports = []
+
+            self.files[key] = {
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "imports": imports,
+            }
+            changed = True
+
+        # Drop files that disappeared
+        for key in [key for key in self.files if key not in current]:
+            del self.files[key]
+            changed = True
+
+        return changed
+
+    def _resolve(
+        self,
+        key: str,
+        record: ImportRecord,
+        modules: Dict[str, str],
+        file_modules: Dict[str, str],
+    ) -> Set[str]:
+        """Resolve an import record to project files.
+
+        Importing ``a.b.c`` also executes the ``a`` and ``a.b`` packages, and
+        ``from a import b`` may import the submodule ``a.b``.
+
+        Args:
+            key: Key of the importing file.
+            record: Import record.
+            modules: Module name to file key mapping.
+            file_modules: File key to module name mapping.
+
+        Returns:
+            Keys of the imported project files.
+        """
+        module, level, names = record
+
+        if level:
+            # Relative import: anchor on the importing file's package
+            own = file_modules.get(key)
+            if own is None:
+                return set()
+            package = own.split(".")
+            if not key.endswith("__init__.py"):
+                package = package[:-1]
+            if level > 1:
+                package = package[: len(package) - (level - 1)]
+            module = ".".join(package + ([module] if module else []))
+
+        targets: Set[str] = set()
+        parts = module.split(".") if module else []
+        for i in range(1, len(parts) + 1):
+            target = modules.get(".".join(parts[:i]))
+            if target is not None:
+                targets.add(target)
+        for name in names:
+            target = modules.get(f"{module}.{name}" if module else name)
+            if target is not None:
+                targets.add(target)
+
+        targets.discard(key)
+        return targets
+
+    def _conftests(self, key: str, roots: Set[str]) -> Set[str]:
+        """Find the indexed ``conftest.py`` files pytest loads for a test file.
+
+        Args:
+            key: Key of the test file.
+            roots: Keys of the source root directories.
+
+        Returns:
+            Keys of the ``conftest.py`` files in the directories from the test
+            file up to its source root.
+        """
+        conftests: Set[str] = set()
+        directory = os.path.dirname(key)
+        while True:
+            conftest = os.path.normpath(os.path.join(directory, "conftest.py"))
+            if conftest in self.files and conftest != key:
+                conftests.add(conftest)
+            if (directory or ".") in roots or not directory:
+                return conftests
+            directory = os.path.dirname(directory)
+
+    def update(
+        self,
+        test_files: Iterable[Path],
+        known_imports: Optional[Dict[str, List[ImportRecord]]] = None,
+    ) -> None:
+        """Bring the graph up to date and rebuild the reachability indexes.
+
+        Only files whose mtime or size changed are re-parsed; the indexes are
+        rebuilt only if a file or the set of test files changed.
+
+        Args:
+            test_files: Test files to compute reachability for.
+            known_imports: Imports already parsed by the scanner, by file key.
+        """
+        modules = self._source_files()
+        test_keys = sorted({file_key(path) for path in test_files})
+
+        changed = self._refresh(
+            set(modules.values()) | set(test_keys), known_imports or {}
+        )
+        if not changed and set(self.reach) == set(test_keys):
+            return
+
+        file_modules = {key: module for module, key in modules.items()}
+        edges: Dict[str, Set[str]] = {
+            key: set().union(
+                *(
+                    self._resolve(key, record, modules, file_modules)
+                    for record in entry["imports"]
+                )
+            )
+            for key, entry in self.files.items()
+        }
+
+        # Fixtures of the conftest files above a test are implicit imports
+        roots = {file_key(Path(root)) for root in self.config.source_roots}
+        for test_key in test_keys:
+            edges.setdefault(test_key, set()).update(self._conftests(test_key, roots))
+
+        # Transitive closure of every test file and the reverse index
+        self.reach = {}
+        reverse: Dict[str, Set[str]] = {}
+        for test_key in test_keys:
+            seen = {test_key}
+            queue = deque([test_key])
+            while queue:
+                for target in edges.get(queue.popleft(), ()):
+                    if target not in seen:
+                        seen.add(target)
+                        queue.append(target)
+            self.reach[test_key] = sorted(seen)
+            for target in seen:
+                reverse.setdefault(target, set()).add(test_key)
+
+        self.reverse = {key: sorted(value) for key, value in reverse.items()}
+        self.dirty = True
+        self.save()
+
+    def reachable(self, file_path: Path) -> List[Path]:
+        """Get the project files a test file can reach through imports.
+
+        Args:
+            file_path: Test file.
+
+        Returns:
+            Reachable files, including the test file itself.
+        """
+        key = file_key(file_path)
+        return [Path(p) for p in self.reach.get(key, [key])]
+
+    def dependents(self, file_path: Path) -> List[Path]:
+        """Get the test files that reach a file through imports.
+
+        Args:
+            file_path: Any project file.
+
+        Returns:
+            Test files reaching the file.
+        """
+        return [Path(p) for p in self.reverse.get(file_key(file_path), [])]
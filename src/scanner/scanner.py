@@ -5,16 +5,44 @@ Provides functionality to discover and analyze test files.
 """
 
 import ast
+import concurrent.futures
+import mmap
+import os
 import re
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Generator, List, Optional, Set
+from typing import (
+    Any,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
 from ..core.config import TestConfig
 from ..core.exceptions import ScanError
 from ..core.logger import get_logger
+from .cache import ScanCache, content_hash
+from .graph import ImportGraph, ImportRecord, file_key, import_records
 
 logger = get_logger(__name__)
 
+# Minimum number of files to parse before a cold scan uses worker processes
+MIN_PARALLEL_FILES = 32
+
+# Files at least this large are memory-mapped instead of read into memory
+MMAP_THRESHOLD = 1024 * 1024
+
+# Byte patterns without which TestVisitor cannot find any test: a function
+# named ``test_*`` or a bare ``@pytest`` decorator
+TEST_CANDIDATE = re.compile(rb"def\s+test_|@\s*pytest\s*$", re.MULTILINE)
+
+FileContent = Union[bytes, mmap.mmap]
+
 
 class TestInfo:
     """Information about a discovered test."""
@@ -28,6 +56,7 @@ class TestInfo:
         function_name: str = "",
         description: str = "",
         markers: Optional[List[str]] = None,
+        fixtures: Optional[List[str]] = None,
     ) -> None:
         """Initialize test information.
 
@@ -39,6 +68,8 @@ class TestInfo:
             function_name: Test function name.
             description: Test description from docstring.
             markers: Optional list of test markers.
+            fixtures: Optional list of fixtures the test requests, from its
+                arguments and ``usefixtures`` markers.
         """
         self.id = id
         self.file_path = file_path
@@ -47,6 +78,38 @@ class TestInfo:
         self.function_name = function_name
         self.description = description
         self.markers = markers or []
+        self.fixtures = fixtures or []
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize test information for the scan index.
+
+        The file path is not stored; the index is keyed by it.
+
+        Returns:
+            JSON-serializable dictionary.
+        """
+        return {
+            "id": self.id,
+            "line_number": self.line_number,
+            "class_name": self.class_name,
+            "function_name": self.function_name,
+            "description": self.description,
+            "markers": self.markers,
+            "fixtures": self.fixtures,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], file_path: Path) -> "TestInfo":
+        """Restore test information from the scan index.
+
+        Args:
+            data: Dictionary created by ``to_dict``.
+            file_path: Path of the file containing the test.
+
+        Returns:
+            Test information.
+        """
+        return cls(file_path=file_path, **data)
 
 
 class TestVisitor(ast.NodeVisitor):
@@ -60,8 +123,25 @@ class TestVisitor(ast.NodeVisitor):
         """
         self.file_path = file_path
         self.tests: List[TestInfo] = []
+        self.imports: List[ImportRecord] = []
         self.current_class: Optional[str] = None
 
+    def visit_Import(self, node: ast.Import) -> None:
+        """Visit an ``import`` statement.
+
+        Args:
+            node: Import node.
+        """
+        self.imports.extend(import_records(node))
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        """Visit a ``from ... import`` statement.
+
+        Args:
+            node: Import node.
+        """
+        self.imports.extend(import_records(node))
+
     def visit_ClassDef(self, node: ast.ClassDef) -> None:
         """Visit a class definition.
 
@@ -90,6 +170,10 @@ class TestVisitor(ast.NodeVisitor):
         Args:
             node: Function definition node.
         """
+        # Function bodies are not visited further, collect their imports here
+        for child in ast.walk(node):
+            self.imports.extend(import_records(child))
+
         # Check if it's a test function
         if node.name.startswith("test_") or any(
             isinstance(dec, ast.Name) and dec.id == "pytest"
@@ -106,6 +190,24 @@ class TestVisitor(ast.NodeVisitor):
                         if isinstance(dec.args[0], ast.Constant):
                             markers.append(str(dec.args[0].value))
 
+            # Extract requested fixtures from arguments and usefixtures
+            fixtures = [
+                arg.arg
+                for arg in node.args.posonlyargs + node.args.args + node.args.kwonlyargs
+                if arg.arg not in ("self", "cls")
+            ]
+            for dec in node.decorator_list:
+                if (
+                    isinstance(dec, ast.Call)
+                    and isinstance(dec.func, ast.Attribute)
+                    and dec.func.attr == "usefixtures"
+                ):
+                    fixtures.extend(
+                        str(arg.value)
+                        for arg in dec.args
+                        if isinstance(arg, ast.Constant)
+                    )
+
             # Create unique test ID
             test_id = f"{self.file_path.stem}::{self.current_class or ''}"
             if self.current_class:
@@ -122,20 +224,86 @@ class TestVisitor(ast.NodeVisitor):
                     function_name=node.name,
                     description=description,
                     markers=markers,
+                    fixtures=fixtures,
                 )
             )
 
 
+@contextmanager
+def _open_content(file_path: Path) -> Iterator[FileContent]:
+    """Open a file's raw content, memory-mapping large files.
+
+    Args:
+        file_path: Path of the file.
+
+    Yields:
+        File content as bytes or a read-only memory map.
+    """
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield data
+        else:
+            yield f.read()
+
+
+def _parse_tests(
+    file_path: Path, data: FileContent
+) -> Tuple[List[TestInfo], List[ImportRecord]]:
+    """Parse file content and find its tests and imported modules.
+
+    Content without any test candidate is rejected by a byte-level search
+    before it is decoded or parsed.
+
+    Args:
+        file_path: Path of the file.
+        data: Raw file content.
+
+    Returns:
+        Tuple of discovered tests and import records of the file.
+    """
+    if not TEST_CANDIDATE.search(data):
+        return [], []
+
+    tree = ast.parse(bytes(data).decode("utf-8"), filename=str(file_path))
+
+    # Find tests
+    visitor = TestVisitor(file_path)
+    visitor.visit(tree)
+
+    return visitor.tests, visitor.imports
+
+
+def _scan_in_worker(
+    file_path: Path,
+) -> Tuple[str, List[Dict[str, Any]], List[ImportRecord]]:
+    """Read, hash and parse a file inside a scan worker process.
+
+    Args:
+        file_path: Path of the file.
+
+    Returns:
+        Tuple of content hash, serialized tests and import records.
+    """
+    with _open_content(file_path) as data:
+        tests, imports = _parse_tests(file_path, data)
+        return content_hash(data), [test.to_dict() for test in tests], imports
+
+
 class TestScanner:
     """Scanner for discovering tests in Python files."""
 
-    def __init__(self, config: TestConfig) -> None:
+    def __init__(self, config: TestConfig, cache_dir: Optional[Path] = None) -> None:
         """Initialize scanner with configuration.
 
         Args:
             config: Test configuration.
+            cache_dir: Optional directory for the persistent scan index.
         """
         self.config = config
+        self.cache = ScanCache(cache_dir)
+        self.graph = ImportGraph(config, cache_dir)
+        self._graph_files: Optional[Dict[str, str]] = None
 
     def scan_file(self, file_path: Path) -> List[TestInfo]:
         """Scan a single file for tests.
@@ -149,25 +317,100 @@ class TestScanner:
         Raises:
             ScanError: If file cannot be scanned.
         """
-        try:
-            # Read and parse file
-            with open(file_path, "r", encoding="utf-8") as f:
-                tree = ast.parse(f.read(), filename=str(file_path))
+        tests = self._scan_file_cached(file_path)
+        self.cache.save()
+        return tests
+
+    def _scan_file_cached(self, file_path: Path) -> List[TestInfo]:
+        """Scan a file, reusing the scan index when the file is unchanged.
 
-            # Find tests
-            visitor = TestVisitor(file_path)
-            visitor.visit(tree)
+        Files whose mtime and size match the index are not read at all;
+        touched files are only re-parsed if their content hash changed.
 
-            return visitor.tests
+        Args:
+            file_path: Path to file to scan.
+
+        Returns:
+            List of discovered tests.
+
+        Raises:
+            ScanError: If file cannot be scanned.
+        """
+        try:
+            stat = os.stat(file_path)
+            entry = self.cache.lookup(file_path, stat)
+
+            if entry is None:
+                # Read and parse file
+                with _open_content(file_path) as data:
+                    digest = content_hash(data)
+                    entry = self.cache.lookup_content(file_path, stat, digest)
+
+                    if entry is None:
+                        tests, imports = _parse_tests(file_path, data)
+                        self.cache.store(
+                            file_path,
+                            stat,
+                            digest,
+                            [test.to_dict() for test in tests],
+                            imports,
+                        )
+                        return tests
+
+            return [TestInfo.from_dict(item, file_path) for item in entry["tests"]]
 
         except Exception as e:
             raise ScanError(f"Failed to scan file {file_path}: {str(e)}")
 
+    def _submit_cold_files(self, paths: List[Path]) -> Tuple[
+        Optional[concurrent.futures.ProcessPoolExecutor],
+        Dict[Path, Tuple[os.stat_result, "concurrent.futures.Future[Any]"]],
+    ]:
+        """Start parsing files missing from the scan index in worker processes.
+
+        Nothing is submitted when parallel scanning is disabled or when too
+        few files need parsing to amortize the pool startup.
+
+        Args:
+            paths: Files about to be scanned.
+
+        Returns:
+            Tuple of the process pool (if started) and the pending parse
+            jobs keyed by path.
+        """
+        workers = self.config.scan_workers or os.cpu_count() or 1
+        if workers <= 1:
+            return None, {}
+
+        cold: Dict[Path, os.stat_result] = {}
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if self.cache.lookup(path, stat) is None:
+                cold[path] = stat
+
+        if len(cold) < MIN_PARALLEL_FILES:
+            return None, {}
+
+        pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=min(workers, len(cold))
+        )
+        pending = {
+            path: (stat, pool.submit(_scan_in_worker, path))
+            for path, stat in cold.items()
+        }
+        return pool, pending
+
     def scan_directory(
         self, directory: Path, pattern: str = "test_*.py"
     ) -> Generator[TestInfo, None, None]:
         """Scan a directory recursively for test files.
 
+        On a cold index, files are parsed by ``scan_workers`` processes while
+        tests are still yielded in file order as soon as they are available.
+
         Args:
             directory: Directory to scan.
             pattern: Glob pattern for test files.
@@ -185,23 +428,154 @@ class TestScanner:
             ]
 
             # Walk directory
+            paths: List[Path] = []
             for path in directory.rglob(pattern):
                 # Check if path should be excluded
                 if any(p.match(str(path)) for p in exclude_patterns):
                     continue
-
-                try:
-                    yield from self.scan_file(path)
-                except Exception as e:
-                    logger.warning(f"Failed to scan {path}: {e}")
-                    continue
+                paths.append(path)
+
+            # Parse files missing from the index in worker processes
+            pool, pending = self._submit_cold_files(paths)
+            try:
+                for path in paths:
+                    try:
+                        if path in pending:
+                            stat, future = pending.pop(path)
+                            digest, tests, imports = future.result()
+                            self.cache.store(path, stat, digest, tests, imports)
+                            yield from (
+                                TestInfo.from_dict(item, path) for item in tests
+                            )
+                        else:
+                            yield from self._scan_file_cached(path)
+                    except Exception as e:
+                        logger.warning(f"Failed to scan {path}: {e}")
+                        continue
+            finally:
+                if pool is not None:
+                    pool.shutdown(wait=False, cancel_futures=True)
+
+            # Persist the index once the whole directory has been scanned
+            self.cache.prune(directory, [str(path) for path in paths])
+            self.cache.save()
 
         except Exception as e:
             raise ScanError(f"Failed to scan directory {directory}: {str(e)}")
 
+    def _ensure_graph(self, file_path: Optional[Path] = None) -> None:
+        """Bring the import graph up to date with the scanned test files.
+
+        The graph is refreshed once per scanner, and again when a test file
+        it does not know yet is queried.
+
+        Args:
+            file_path: Optional test file that must be part of the graph.
+        """
+        if file_path is not None and str(file_path) not in self.cache.entries:
+            self._scan_file_cached(file_path)
+            self._graph_files = None
+
+        if self._graph_files is not None:
+            return
+
+        # Test files and their imports, as parsed during discovery
+        self._graph_files = {}
+        known_imports: Dict[str, List[ImportRecord]] = {}
+        for key, entry in self.cache.entries.items():
+            if not entry["tests"]:
+                continue
+            try:
+                stat = os.stat(key)
+            except OSError:
+                continue
+            graph_key = file_key(Path(key))
+            self._graph_files[graph_key] = key
+            if self.cache.lookup(Path(key), stat) is not None:
+                known_imports[graph_key] = entry["imports"]
+
+        self.graph.update([Path(key) for key in self._graph_files], known_imports)
+        self.cache.save()
+
+    def get_dependent_tests(self, file_path: Path) -> List[TestInfo]:
+        """Get the tests that can reach a file through imports.
+
+        Args:
+            file_path: Any project file.
+
+        Returns:
+            Tests whose files import the file directly or transitively.
+        """
+        self._ensure_graph()
+        assert self._graph_files is not None
+
+        tests: List[TestInfo] = []
+        for test_file in self.graph.dependents(file_path):
+            key = self._graph_files.get(str(test_file), str(test_file))
+            entry = self.cache.get(Path(key))
+            if entry is not None:
+                tests.extend(
+                    TestInfo.from_dict(item, Path(key)) for item in entry["tests"]
+                )
+        return tests
+
+    def select_affected(
+        self, tests: List[TestInfo], changed: List[Path]
+    ) -> List[TestInfo]:
+        """Select the tests affected by changed files.
+
+        A test is affected if its file reaches a changed file through
+        imports, including those of the ``conftest.py`` files above it, or if
+        a ``conftest.py`` in one of its parent directories changed. Deleted modules are looked up in the graph as it was before
+        they disappeared; if it never indexed them, all tests are affected.
+
+        Args:
+            tests: Candidate tests.
+            changed: Changed file paths.
+
+        Returns:
+            Affected tests, in their original order.
+        """
+        # Deleted modules drop out of the graph when it is refreshed
+        affected: Set[str] = set()
+        for path in changed:
+            if path.suffix != ".py" or path.name == "conftest.py" or path.exists():
+                continue
+            key = file_key(path)
+            if key not in self.graph.reverse:
+                logger.info(f"Deleted file {path} is not indexed, selecting all tests")
+                return list(tests)
+            affected.update(self.graph.reverse[key])
+
+        for test in tests:
+            if str(test.file_path) not in self.cache.entries:
+                self._scan_file_cached(test.file_path)
+                self._graph_files = None
+        self._ensure_graph()
+
+        conftest_dirs: List[str] = []
+        for path in changed:
+            if path.name == "conftest.py":
+                conftest_dirs.append(os.path.dirname(file_key(path)))
+            affected.update(str(test_file) for test_file in self.graph.dependents(path))
+
+        selected: List[TestInfo] = []
+        for test in tests:
+            key = file_key(test.file_path)
+            if key in affected or any(
+                directory in ("", ".") or key.startswith(directory + os.sep)
+                for directory in conftest_dirs
+            ):
+                selected.append(test)
+        return selected
+
     def get_test_dependencies(self, test: TestInfo) -> List[Path]:
         """Get dependencies for a test.
 
+        Dependencies are all project files the test file reaches through
+        absolute, relative and package imports, transitively, starting from
+        the test file and the ``conftest.py`` files above it.
+
         Args:
             test: Test to get dependencies for.
 
@@ -209,27 +583,8 @@ class TestScanner:
             List of dependency file paths.
         """
         try:
-            deps: Set[Path] = set()
-
-            # Add test file
-            deps.add(test.file_path)
-
-            # Parse imports
-            with open(test.file_path, "r", encoding="utf-8") as f:
-                tree = ast.parse(f.read())
-
-            # Find all imports
-            for node in ast.walk(tree):
-                if isinstance(node, (ast.Import, ast.ImportFrom)):
-                    module = node.module if isinstance(node, ast.ImportFrom) else None
-                    if module:
-                        # Convert module to path
-                        parts = module.split(".")
-                        path = Path(*parts).with_suffix(".py")
-                        if path.exists():
-                            deps.add(path)
-
-            return list(deps)
+            self._ensure_graph(test.file_path)
+            return self.graph.reachable(test.file_path)
 
         except Exception as e:
             logger.warning(f"Failed to get dependencies for {test.id}: {e}")